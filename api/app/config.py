@@ -13,6 +13,10 @@ class RedisConfig:
     db: int = int(os.getenv('REDIS_DB', 0))
     socket_timeout: int = int(os.getenv('REDIS_SOCKET_TIMEOUT', 30))
     socket_connect_timeout: int = int(os.getenv('REDIS_CONNECT_TIMEOUT', 10))
+    # Los endpoints síncronos corren en el threadpool de Starlette (40 hilos por defecto):
+    # una conexión por hilo, y si se agotan se espera pool_timeout en vez de fallar
+    max_connections: int = int(os.getenv('REDIS_MAX_CONNECTIONS', 40))
+    pool_timeout: float = float(os.getenv('REDIS_POOL_TIMEOUT', 5))
 
 @dataclass
 class APIConfig:
@@ -1,6 +1,7 @@
 # main.py CORREGIDO
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 import logging
 from datetime import datetime
@@ -16,7 +17,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="IoT Monitoring API with Predictions",
     description="API para consultar datos de sensores IoT y hacer predicciones",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse  # Serialización JSON con orjson
 )
 
 # Configurar CORS
@@ -28,6 +30,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Mapear nombres en inglés (rutas) a español (claves de Redis); se construye una sola vez
+SENSOR_MAP = {
+    'air': 'aire',
+    'sound': 'sonido',
+    'water': 'agua'
+}
+
 # Variables globales - inicializar como None
 redis_client = None
 ml_predictor = None
@@ -89,7 +98,7 @@ async def root():
     }
 
 @app.get("/health")
-async def health_check():
+def health_check():
     """Verificar salud de la API"""
     try:
         redis_status = "disconnected"
@@ -112,9 +121,11 @@ async def health_check():
         }
 
 # ==================== ENDPOINTS DE SENSORES ====================
+# Los endpoints con I/O bloqueante (Redis, sklearn) son 'def': FastAPI los ejecuta
+# en su threadpool y no bloquean el event loop.
 
 @app.get("/api/air")
-async def get_air_data(
+def get_air_data(
     limit: int = Query(50, ge=1, le=500),
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100)
@@ -134,16 +145,8 @@ async def get_air_data(
         
         paginated_devices = devices[start_idx:end_idx]
         
-        result = []
-        for device_name in paginated_devices:
-            device_data = redis_client.get_device_data(device_name)
-            history = redis_client.get_device_history('aire', device_name, limit=5)
-            
-            result.append({
-                **device_data,
-                "recent_measurements": history,
-                "device_name": device_name
-            })
+        # Un solo pipeline de Redis para todos los dispositivos
+        result = redis_client.get_devices_snapshot('aire', paginated_devices, history_limit=5)
         
         return {
             "sensor_type": "air",
@@ -162,7 +165,7 @@ async def get_air_data(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/sound")
-async def get_sound_data(limit: int = Query(50, ge=1, le=500)):
+def get_sound_data(limit: int = Query(50, ge=1, le=500)):
     """Obtener datos de sensores de sonido"""
     if not redis_client or not redis_client.client:
         raise HTTPException(status_code=503, detail="Redis no disponible")
@@ -170,16 +173,8 @@ async def get_sound_data(limit: int = Query(50, ge=1, le=500)):
     try:
         devices = redis_client.get_active_devices('sonido') or []
         
-        result = []
-        for device_name in devices[:limit]:
-            device_data = redis_client.get_device_data(device_name)
-            history = redis_client.get_device_history('sonido', device_name, limit=10)
-            
-            result.append({
-                **device_data,
-                "recent_measurements": history,
-                "device_name": device_name
-            })
+        # Un solo pipeline de Redis para todos los dispositivos
+        result = redis_client.get_devices_snapshot('sonido', devices[:limit], history_limit=10)
         
         return {
             "sensor_type": "sound",
@@ -191,7 +186,7 @@ async def get_sound_data(limit: int = Query(50, ge=1, le=500)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/water")
-async def get_water_data(limit: int = Query(50, ge=1, le=500)):
+def get_water_data(limit: int = Query(50, ge=1, le=500)):
     """Obtener datos de sensores de agua"""
     if not redis_client or not redis_client.client:
         raise HTTPException(status_code=503, detail="Redis no disponible")
@@ -199,16 +194,8 @@ async def get_water_data(limit: int = Query(50, ge=1, le=500)):
     try:
         devices = redis_client.get_active_devices('agua') or []
         
-        result = []
-        for device_name in devices[:limit]:
-            device_data = redis_client.get_device_data(device_name)
-            history = redis_client.get_device_history('agua', device_name, limit=10)
-            
-            result.append({
-                **device_data,
-                "recent_measurements": history,
-                "device_name": device_name
-            })
+        # Un solo pipeline de Redis para todos los dispositivos
+        result = redis_client.get_devices_snapshot('agua', devices[:limit], history_limit=10)
         
         return {
             "sensor_type": "water",
@@ -221,7 +208,7 @@ async def get_water_data(limit: int = Query(50, ge=1, le=500)):
     
 
 @app.get("/api/air/all")
-async def get_all_air_data():
+def get_all_air_data():
     """Obtener TODOS los datos de sensores de aire sin límite de paginación"""
     if not redis_client or not redis_client.client:
         raise HTTPException(status_code=503, detail="Redis no disponible")
@@ -229,17 +216,8 @@ async def get_all_air_data():
     try:
         devices = redis_client.get_active_devices('aire') or []
         
-        result = []
-        for device_name in devices:
-            device_data = redis_client.get_device_data(device_name)
-            # Puedes ajustar el límite del historial según necesites
-            history = redis_client.get_device_history('aire', device_name, limit=100)
-            
-            result.append({
-                **device_data,
-                "recent_measurements": history,
-                "device_name": device_name
-            })
+        # Un solo pipeline de Redis para todos los dispositivos
+        result = redis_client.get_devices_snapshot('aire', devices, history_limit=100)
         
         return {
             "sensor_type": "air",
@@ -251,7 +229,7 @@ async def get_all_air_data():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/sound/all")
-async def get_all_sound_data():
+def get_all_sound_data():
     """Obtener TODOS los datos de sensores de sonido sin límite"""
     if not redis_client or not redis_client.client:
         raise HTTPException(status_code=503, detail="Redis no disponible")
@@ -259,16 +237,8 @@ async def get_all_sound_data():
     try:
         devices = redis_client.get_active_devices('sonido') or []
         
-        result = []
-        for device_name in devices:  # Sin límite [:limit]
-            device_data = redis_client.get_device_data(device_name)
-            history = redis_client.get_device_history('sonido', device_name, limit=100)
-            
-            result.append({
-                **device_data,
-                "recent_measurements": history,
-                "device_name": device_name
-            })
+        # Un solo pipeline de Redis para todos los dispositivos
+        result = redis_client.get_devices_snapshot('sonido', devices, history_limit=100)
         
         return {
             "sensor_type": "sound",
@@ -280,7 +250,7 @@ async def get_all_sound_data():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/water/all")
-async def get_all_water_data():
+def get_all_water_data():
     """Obtener TODOS los datos de sensores de agua sin límite"""
     if not redis_client or not redis_client.client:
         raise HTTPException(status_code=503, detail="Redis no disponible")
@@ -288,16 +258,8 @@ async def get_all_water_data():
     try:
         devices = redis_client.get_active_devices('agua') or []
         
-        result = []
-        for device_name in devices:  # Sin límite [:limit]
-            device_data = redis_client.get_device_data(device_name)
-            history = redis_client.get_device_history('agua', device_name, limit=100)
-            
-            result.append({
-                **device_data,
-                "recent_measurements": history,
-                "device_name": device_name
-            })
+        # Un solo pipeline de Redis para todos los dispositivos
+        result = redis_client.get_devices_snapshot('agua', devices, history_limit=100)
         
         return {
             "sensor_type": "water",
@@ -311,7 +273,7 @@ async def get_all_water_data():
 # ==================== ENDPOINTS DE HISTORIAL ====================
 
 @app.get("/api/{sensor_type}/history")
-async def get_sensor_history(
+def get_sensor_history(
     sensor_type: str,
     device_name: Optional[str] = None,
     limit: int = Query(100, ge=1, le=1000)
@@ -326,17 +288,10 @@ async def get_sensor_history(
     if not redis_client or not redis_client.client:
         raise HTTPException(status_code=503, detail="Redis no disponible")
     
-    # Mapear nombres en inglés a español (para Redis)
-    sensor_map = {
-        'air': 'aire',
-        'sound': 'sonido',
-        'water': 'agua'
-    }
-    
-    if sensor_type not in sensor_map:
+    if sensor_type not in SENSOR_MAP:
         raise HTTPException(status_code=400, detail="sensor_type must be: air, sound, or water")
     
-    redis_sensor_type = sensor_map[sensor_type]
+    redis_sensor_type = SENSOR_MAP[sensor_type]
     
     try:
         if device_name:
@@ -357,7 +312,7 @@ async def get_sensor_history(
 # ==================== ENDPOINTS DE MACHINE LEARNING ====================
 
 @app.get("/api/stats/{sensor_type}")
-async def get_sensor_stats(
+def get_sensor_stats(
     sensor_type: str,
     device_name: Optional[str] = None
 ):
@@ -367,16 +322,10 @@ async def get_sensor_stats(
     if not redis_client or not redis_client.client:
         raise HTTPException(status_code=503, detail="Redis no disponible")
     
-    sensor_map = {
-        'air': 'aire',
-        'sound': 'sonido',
-        'water': 'agua'
-    }
-    
-    if sensor_type not in sensor_map:
+    if sensor_type not in SENSOR_MAP:
         raise HTTPException(status_code=400, detail="sensor_type must be: air, sound, or water")
     
-    redis_sensor_type = sensor_map[sensor_type]
+    redis_sensor_type = SENSOR_MAP[sensor_type]
     
     try:
         # Obtener datos
@@ -454,7 +403,7 @@ async def get_sensor_stats(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/ml/train/{sensor_type}")
-async def train_ml_model(sensor_type: str):
+def train_ml_model(sensor_type: str):
     """
     Entrenar modelo predictivo para un tipo de sensor
     
@@ -463,16 +412,10 @@ async def train_ml_model(sensor_type: str):
     if not ml_predictor:
         raise HTTPException(status_code=503, detail="ML Predictor no inicializado")
     
-    sensor_map = {
-        'air': 'aire',
-        'sound': 'sonido', 
-        'water': 'agua'
-    }
-    
-    if sensor_type not in sensor_map:
+    if sensor_type not in SENSOR_MAP:
         raise HTTPException(status_code=400, detail="sensor_type must be: air, sound, or water")
     
-    redis_sensor_type = sensor_map[sensor_type]
+    redis_sensor_type = SENSOR_MAP[sensor_type]
     
     try:
         result = ml_predictor.train_model(redis_sensor_type)
@@ -482,7 +425,7 @@ async def train_ml_model(sensor_type: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/ml/predict/{sensor_type}")
-async def predict_future(
+def predict_future(
     sensor_type: str,
     days: int = Query(7, ge=1, le=30)
 ):
@@ -495,16 +438,10 @@ async def predict_future(
     if not ml_predictor:
         raise HTTPException(status_code=503, detail="ML Predictor no inicializado")
     
-    sensor_map = {
-        'air': 'aire',
-        'sound': 'sonido',
-        'water': 'agua'
-    }
-    
-    if sensor_type not in sensor_map:
+    if sensor_type not in SENSOR_MAP:
         raise HTTPException(status_code=400, detail="sensor_type must be: air, sound, or water")
     
-    redis_sensor_type = sensor_map[sensor_type]
+    redis_sensor_type = SENSOR_MAP[sensor_type]
     
     try:
         result = ml_predictor.predict(redis_sensor_type, days)
@@ -514,23 +451,17 @@ async def predict_future(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/ml/info/{sensor_type}")
-async def get_model_info(sensor_type: str):
+def get_model_info(sensor_type: str):
     """
     Obtener información del modelo entrenado
     """
     if not ml_predictor:
         raise HTTPException(status_code=503, detail="ML Predictor no inicializado")
     
-    sensor_map = {
-        'air': 'aire',
-        'sound': 'sonido',
-        'water': 'agua'
-    }
-    
-    if sensor_type not in sensor_map:
+    if sensor_type not in SENSOR_MAP:
         raise HTTPException(status_code=400, detail="sensor_type must be: air, sound, or water")
     
-    redis_sensor_type = sensor_map[sensor_type]
+    redis_sensor_type = SENSOR_MAP[sensor_type]
     
     try:
         info = ml_predictor.get_model_info(redis_sensor_type)
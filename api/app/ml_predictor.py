@@ -61,17 +61,26 @@ class MLPredictor:
             logger.warning(f"No hay datos para {sensor_type}")
             return pd.DataFrame()
         
-        # Convertir a DataFrame
-        records = []
+        # Campos según tipo de sensor
+        if sensor_type == 'aire':
+            fields = ['co2', 'temperature', 'humidity', 'pressure', 'battery']
+        elif sensor_type == 'sonido':
+            fields = ['laeq', 'lai', 'laimax', 'battery']
+        elif sensor_type == 'agua':
+            fields = ['water_level', 'distance', 'battery']
+        else:
+            fields = []
+        
+        # Construir columnas directamente (sin un dict intermedio por registro)
+        columns = {'timestamp': [], 'device_name': []}
+        columns.update({field: [] for field in fields})
+        
         for item in raw_data:
             try:
                 # Asegurar que tenemos el campo 'data'
                 if 'data' not in item:
                     # Si no hay 'data', usar todo el item como datos
-                    data = {k: v for k, v in item.items() 
-                        if k not in ['timestamp', 'device_name']}
-                    timestamp = item.get('timestamp')
-                    device_name = item.get('device_name')
+                    data = item
                 else:
                     data = item.get('data', {})
                     if isinstance(data, str):
@@ -79,50 +88,26 @@ class MLPredictor:
                             data = json.loads(data)
                         except:
                             data = {}
-                    timestamp = item.get('timestamp')
-                    device_name = item.get('device_name')
-                
-                # Crear registro
-                record = {
-                    'timestamp': timestamp,
-                    'device_name': device_name,
-                }
-                
-                # Agregar campos según tipo de sensor
-                if sensor_type == 'aire':
-                    fields = ['co2', 'temperature', 'humidity', 'pressure', 'battery']
-                elif sensor_type == 'sonido':
-                    fields = ['laeq', 'lai', 'laimax', 'battery']
-                elif sensor_type == 'agua':
-                    fields = ['water_level', 'distance', 'battery']
-                else:
-                    fields = []
-                
-                # Agregar campos existentes
-                for field in fields:
-                    if field in data:
-                        try:
-                            # Convertir a float si es posible
-                            value = data[field]
-                            if isinstance(value, str):
-                                # Limpiar strings
-                                value = value.replace(',', '.')
-                            record[field] = float(value) if value not in [None, ''] else None
-                        except:
-                            record[field] = None
-                    else:
-                        record[field] = None
-                
-                records.append(record)
                 
+                values = [data.get(field) for field in fields]
             except Exception as e:
                 logger.warning(f"Error procesando registro: {e}")
                 continue
+            
+            columns['timestamp'].append(item.get('timestamp'))
+            columns['device_name'].append(item.get('device_name'))
+            for field, value in zip(fields, values):
+                columns[field].append(value)
         
-        if not records:
+        if not columns['timestamp']:
             return pd.DataFrame()
         
-        df = pd.DataFrame(records)
+        df = pd.DataFrame(columns)
+        
+        # Convertir a float columna por columna (limpiando comas decimales)
+        for field in fields:
+            if df[field].dtype == object:
+                df[field] = pd.to_numeric(df[field].astype(str).str.replace(',', '.', regex=False), errors='coerce')
         
         # Convertir timestamp a datetime
         if 'timestamp' in df.columns:
@@ -401,6 +386,10 @@ class MLPredictor:
             joblib.dump(scaler, scaler_path)
             joblib.dump(clf_model, clf_path)
             
+            # Refrescar la caché en memoria para que predict/dashboard usen el modelo nuevo
+            self.models[sensor_type] = reg_model
+            self.scalers[sensor_type] = scaler
+            
             # Calcular percentiles para interpretación
             percentiles = {
                 'p10': np.percentile(y_test_reg, 10),
@@ -444,6 +433,21 @@ class MLPredictor:
                 'traceback': traceback.format_exc() if self.config.debug else None
             }
     
+    def _load_model(self, sensor_type: str) -> bool:
+        """Cargar modelo y scaler desde disco una sola vez (quedan en memoria)"""
+        if sensor_type in self.models and sensor_type in self.scalers:
+            return True
+        
+        model_path = os.path.join(self.config.models_path, f'{sensor_type}_model.joblib')
+        scaler_path = os.path.join(self.config.models_path, f'{sensor_type}_scaler.joblib')
+        
+        if not os.path.exists(model_path):
+            return False
+        
+        self.models[sensor_type] = joblib.load(model_path)
+        self.scalers[sensor_type] = joblib.load(scaler_path)
+        return True
+    
     def predict(self, sensor_type: str, days: int = None) -> Dict:
         """Predecir valores futuros"""
         if days is None:
@@ -453,18 +457,11 @@ class MLPredictor:
         
         try:
             # Cargar modelo si no está en memoria
-            if sensor_type not in self.models:
-                model_path = os.path.join(self.config.models_path, f'{sensor_type}_model.joblib')
-                scaler_path = os.path.join(self.config.models_path, f'{sensor_type}_scaler.joblib')
-                
-                if not os.path.exists(model_path):
-                    return {
-                        'success': False,
-                        'error': f'Modelo para {sensor_type} no encontrado. Entrena primero.'
-                    }
-                
-                self.models[sensor_type] = joblib.load(model_path)
-                self.scalers[sensor_type] = joblib.load(scaler_path)
+            if not self._load_model(sensor_type):
+                return {
+                    'success': False,
+                    'error': f'Modelo para {sensor_type} no encontrado. Entrena primero.'
+                }
             
             # Obtener datos históricos recientes
             df, target_col = self.prepare_training_data(sensor_type)
@@ -517,6 +514,9 @@ class MLPredictor:
                 last_record[f'{target_col}_lag2'] = last_record[f'{target_col}_lag1']
                 last_record[f'{target_col}_lag1'] = prediction
             
+            # Columna de valores predichos (una sola vez para el resumen)
+            predicted_values = np.array([p['predicted_value'] for p in predictions])
+            
             return {
                 'success': True,
                 'sensor_type': sensor_type,
@@ -524,10 +524,10 @@ class MLPredictor:
                 'prediction_days': days,
                 'predictions': predictions,
                 'summary': {
-                    'avg': np.mean([p['predicted_value'] for p in predictions]),
-                    'min': np.min([p['predicted_value'] for p in predictions]),
-                    'max': np.max([p['predicted_value'] for p in predictions]),
-                    'trend': 'increasing' if predictions[-1]['predicted_value'] > predictions[0]['predicted_value'] else 'decreasing'
+                    'avg': float(predicted_values.mean()),
+                    'min': float(predicted_values.min()),
+                    'max': float(predicted_values.max()),
+                    'trend': 'increasing' if predicted_values[-1] > predicted_values[0] else 'decreasing'
                 }
             }
             
@@ -578,8 +578,9 @@ class MLPredictor:
         # Convertir columnas numéricas
         for col in numeric_cols:
             if col in df.columns:
-                # Reemplazar comas por puntos y convertir
-                df[col] = df[col].replace({',': '.'}, regex=True)
+                # Reemplazar comas por puntos solo en columnas de texto (las numéricas ya están listas)
+                if df[col].dtype == object:
+                    df[col] = df[col].astype(str).str.replace(',', '.', regex=False)
                 df[col] = pd.to_numeric(df[col], errors='coerce')
                 logger.info(f"  {col}: {df[col].notna().sum()} valores válidos")
         
@@ -607,9 +608,7 @@ class MLPredictor:
     def get_model_performance_dashboard(self, sensor_type: str) -> Dict:
         """Obtener dashboard completo de performance del modelo"""
         try:
-            model_path = os.path.join(self.config.models_path, f'{sensor_type}_model.joblib')
-            
-            if not os.path.exists(model_path):
+            if not self._load_model(sensor_type):
                 return {
                     'exists': False,
                     'sensor_type': sensor_type,
@@ -634,27 +633,29 @@ class MLPredictor:
             X = df_features.values
             y = df[target_col].values
             
-            # Cargar modelo y scaler
-            model = joblib.load(model_path)
-            scaler = joblib.load(os.path.join(self.config.models_path, f'{sensor_type}_scaler.joblib'))
+            model = self.models[sensor_type]
+            scaler = self.scalers[sensor_type]
             
             X_scaled = scaler.transform(X)
             predictions = model.predict(X_scaled)
             
-            # Calcular errores por percentil
+            # Calcular errores por percentil (valores absolutos una sola vez)
             errors = predictions - y
+            abs_errors = np.abs(errors)
+            abs_y = np.abs(y)
+            p10, p50, p90 = np.percentile(abs_errors, [10, 50, 90])
             error_percentiles = {
-                'abs_error_p10': np.percentile(np.abs(errors), 10),
-                'abs_error_p50': np.percentile(np.abs(errors), 50),
-                'abs_error_p90': np.percentile(np.abs(errors), 90),
-                'max_abs_error': np.max(np.abs(errors))
+                'abs_error_p10': p10,
+                'abs_error_p50': p50,
+                'abs_error_p90': p90,
+                'max_abs_error': abs_errors.max()
             }
             
             # Distribución de errores
             error_distribution = {
-                'within_5%': np.mean(np.abs(errors) < 0.05 * np.abs(y)) * 100,
-                'within_10%': np.mean(np.abs(errors) < 0.10 * np.abs(y)) * 100,
-                'within_20%': np.mean(np.abs(errors) < 0.20 * np.abs(y)) * 100
+                'within_5%': np.mean(abs_errors < 0.05 * abs_y) * 100,
+                'within_10%': np.mean(abs_errors < 0.10 * abs_y) * 100,
+                'within_20%': np.mean(abs_errors < 0.20 * abs_y) * 100
             }
             
             return {
@@ -662,7 +663,7 @@ class MLPredictor:
                 'sensor_type': sensor_type,
                 'performance': {
                     'current_rmse': np.sqrt(np.mean(errors**2)),
-                    'current_mae': np.mean(np.abs(errors)),
+                    'current_mae': abs_errors.mean(),
                     'current_r2': r2_score(y, predictions),
                     'error_distribution': error_distribution,
                     'error_percentiles': error_percentiles
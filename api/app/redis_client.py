@@ -21,7 +21,9 @@ class RedisClient:
         
         for attempt in range(self.retry_attempts):
             try:
-                self.client = redis.Redis(
+                # Pool bloqueante: con todas las conexiones en uso se espera una libre
+                # (hasta pool_timeout) en lugar de lanzar "Too many connections"
+                pool = redis.BlockingConnectionPool(
                     host=self.config.host,
                     port=self.config.port,
                     password=self.config.password if self.config.password else None,
@@ -30,8 +32,10 @@ class RedisClient:
                     socket_connect_timeout=5,  # Timeout más corto
                     socket_timeout=5,
                     retry_on_timeout=False,  # Desactivar reintentos automáticos
-                    max_connections=5
+                    max_connections=self.config.max_connections,
+                    timeout=self.config.pool_timeout
                 )
+                self.client = redis.Redis(connection_pool=pool)
                 
                 # Test de conexión
                 if self.client.ping():
@@ -79,48 +83,98 @@ class RedisClient:
             logger.error(f"Error obteniendo datos de dispositivo: {e}")
             return {}
     
+    def _parse_history(self, history_data: List[str]) -> List[Dict]:
+        """Parsear las entradas JSON de una lista de historial"""
+        measurements = []
+        for item in history_data:
+            try:
+                record = json.loads(item)
+                
+                # NUEVA LÓGICA: Si no hay campo 'data', crear uno con todos los campos excepto timestamp
+                if 'data' not in record:
+                    data_fields = {k: v for k, v in record.items() if k != 'timestamp'}
+                    record['data'] = data_fields
+                # Si 'data' es string, parsearlo
+                elif isinstance(record.get('data'), str):
+                    record['data'] = json.loads(record['data'])
+                    
+                measurements.append(record)
+            except Exception as e:
+                logger.warning(f"Error parseando registro: {e}")
+                continue
+        
+        return measurements
+    
     def get_device_history(self, sensor_type: str, device_name: str, limit: int = 100) -> List[Dict]:
         """Obtener historial de un dispositivo"""
         try:
             history_key = f"history:{sensor_type}:{device_name}"
             history_data = self.client.lrange(history_key, 0, limit - 1)
-            
-            measurements = []
-            for item in history_data:
-                try:
-                    record = json.loads(item)
-                    
-                    # NUEVA LÓGICA: Si no hay campo 'data', crear uno con todos los campos excepto timestamp
-                    if 'data' not in record:
-                        data_fields = {k: v for k, v in record.items() if k != 'timestamp'}
-                        record['data'] = data_fields
-                    # Si 'data' es string, parsearlo
-                    elif isinstance(record.get('data'), str):
-                        record['data'] = json.loads(record['data'])
-                        
-                    measurements.append(record)
-                except Exception as e:
-                    logger.warning(f"Error parseando registro: {e}")
-                    continue
-            
-            return measurements
+            return self._parse_history(history_data)
         except Exception as e:
             logger.error(f"Error obteniendo historial: {e}")
             return []
     
+    def get_devices_snapshot(self, sensor_type: str, device_names: List[str], history_limit: int = 10) -> List[Dict]:
+        """Obtener datos actuales e historial reciente de varios dispositivos en un solo round-trip.
+        
+        Un fallo solo deja sin datos al dispositivo afectado (datos {} e historial [])."""
+        if not device_names:
+            return []
+        
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for device_name in device_names:
+                pipe.hgetall(f"device:{device_name}")
+                pipe.lrange(f"history:{sensor_type}:{device_name}", 0, history_limit - 1)
+            # Los errores de cada comando vuelven como respuesta en lugar de abortar el lote
+            replies = pipe.execute(raise_on_error=False)
+        except Exception as e:
+            logger.error(f"Error obteniendo dispositivos de {sensor_type}: {e}")
+            replies = [{}, []] * len(device_names)
+        
+        result = []
+        for index, device_name in enumerate(device_names):
+            device_data = replies[2 * index]
+            if isinstance(device_data, Exception):
+                logger.error(f"Error obteniendo datos de dispositivo {device_name}: {device_data}")
+                device_data = {}
+            
+            history_data = replies[2 * index + 1]
+            if isinstance(history_data, Exception):
+                logger.error(f"Error obteniendo historial de {device_name}: {history_data}")
+                history_data = []
+            
+            result.append({
+                **device_data,
+                "recent_measurements": self._parse_history(history_data),
+                "device_name": device_name
+            })
+        return result
+    
     def get_all_sensor_data(self, sensor_type: str, limit_per_device: int = 50) -> List[Dict]:
         """Obtener todos los datos de un tipo de sensor"""
         try:
             devices = self.get_active_devices(sensor_type)
-            all_data = []
             
+            # Historiales de todos los dispositivos en un solo round-trip
+            pipe = self.client.pipeline(transaction=False)
             for device_name in devices:
-                history = self.get_device_history(sensor_type, device_name, limit_per_device)
-                for record in history:
+                pipe.lrange(f"history:{sensor_type}:{device_name}", 0, limit_per_device - 1)
+            # Los errores de cada LRANGE vuelven como respuesta: solo se pierde ese dispositivo
+            histories = pipe.execute(raise_on_error=False) if devices else []
+            
+            all_data = []
+            for device_name, history_data in zip(devices, histories):
+                if isinstance(history_data, Exception):
+                    logger.error(f"Error obteniendo historial de {device_name}: {history_data}")
+                    continue
+                for record in self._parse_history(history_data):
                     record['device_name'] = device_name
                     all_data.append(record)
             
-            # Ordenar por timestamp
+            # Ordenar por timestamp. Cada historial ya viene casi ordenado (LPUSH),
+            # y timsort aprovecha esas secuencias: el costo queda cerca de una mezcla
             all_data.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
             return all_data
         except Exception as e:
@@ -130,4 +184,5 @@ class RedisClient:
     def close(self):
         """Cerrar conexión"""
         if self.client:
-            self.client.close()
\ No newline at end of file
+            self.client.close()
+            self.client.connection_pool.disconnect()  # Pool propio: Redis.close() no lo cierra
\ No newline at end of file
@@ -46,5 +46,10 @@ class ConsumerConfig:
     """Configuración del consumidor"""
     max_retries: int = 3
     retry_delay: float = 5.0
-    prefetch_count: int = 1
+    prefetch_count: int = int(os.getenv('PREFETCH_COUNT', 1000))  # Por canal (uno por cola)
+    batch_size: int = int(os.getenv('CONSUMER_BATCH_SIZE', 100))
+    flush_interval: float = float(os.getenv('FLUSH_INTERVAL', 1.0))
+    # Procesos de ETL compartidos por los 3 workers de cola, que pasan la mayor parte
+    # del tiempo esperando a PostgreSQL/Redis: 2 bastan. 0 = ETL en el proceso principal
+    etl_workers: int = int(os.getenv('ETL_WORKERS', 2))
     log_level: str = os.getenv('LOG_LEVEL', 'INFO')
\ No newline at end of file
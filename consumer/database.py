@@ -1,10 +1,12 @@
 # consumer/database.py - VERSIÓN FINAL CORREGIDA
 import redis
-import json
+import orjson
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 import logging
 from datetime import datetime, timedelta
+import psycopg2
+from psycopg2.extras import execute_values
 from models import Base, Device, AirMeasurement, SoundMeasurement, WaterMeasurement, Alert
 from config import DatabaseConfig
 
@@ -14,6 +16,31 @@ logger = logging.getLogger(__name__)
 class DatabaseManager:
     """Gestor de conexiones a bases de datos"""
     
+    # Tabla y columnas (en orden) usadas en las inserciones masivas por tipo de sensor
+    MEASUREMENT_COLUMNS = {
+        'aire': ('air_measurements', (
+            'device_name', 'timestamp', 'latitude', 'longitude',
+            'co2', 'temperature', 'humidity', 'pressure', 'battery',
+            'air_quality_category', 'temperature_category', 'data_quality'
+        )),
+        'sonido': ('sound_measurements', (
+            'device_name', 'timestamp', 'latitude', 'longitude',
+            'laeq', 'lai', 'laimax', 'battery', 'status',
+            'noise_category', 'data_quality'
+        )),
+        'agua': ('water_measurements', (
+            'device_name', 'timestamp', 'latitude', 'longitude',
+            'water_level', 'distance', 'battery', 'status', 'code',
+            'tank_status', 'data_quality'
+        )),
+    }
+    
+    # Columnas que se convierten a float antes de insertar
+    NUMERIC_COLUMNS = frozenset([
+        'latitude', 'longitude', 'co2', 'temperature', 'humidity', 'pressure',
+        'battery', 'laeq', 'lai', 'laimax', 'water_level', 'distance'
+    ])
+    
     def __init__(self, config: DatabaseConfig):
         self.config = config
         self.postgres_engine = None
@@ -27,7 +54,7 @@ class DatabaseManager:
         
         for attempt in range(max_retries):
             try:
-                logger.info(f"Conectando a PostgreSQL (intento {attempt + 1}/{max_retries})...")
+                logger.info("Conectando a PostgreSQL (intento %s/%s)...", attempt + 1, max_retries)
                 
                 self.postgres_engine = create_engine(
                     self.config.postgres_url,
@@ -50,9 +77,9 @@ class DatabaseManager:
                 return True
                 
             except Exception as e:
-                logger.error(f"Error conectando a PostgreSQL: {e}")
+                logger.error("Error conectando a PostgreSQL: %s", e)
                 if attempt < max_retries - 1:
-                    logger.info(f"Reintentando en {retry_delay} segundos...")
+                    logger.info("Reintentando en %s segundos...", retry_delay)
                     import time
                     time.sleep(retry_delay)
                 else:
@@ -66,7 +93,7 @@ class DatabaseManager:
         
         for attempt in range(max_retries):
             try:
-                logger.info(f"Conectando a Redis (intento {attempt + 1}/{max_retries})...")
+                logger.info("Conectando a Redis (intento %s/%s)...", attempt + 1, max_retries)
                 
                 self.redis_client = redis.Redis(
                     host=self.config.redis_host,
@@ -86,9 +113,9 @@ class DatabaseManager:
                 return True
                 
             except Exception as e:
-                logger.error(f"Error conectando a Redis: {e}")
+                logger.error("Error conectando a Redis: %s", e)
                 if attempt < max_retries - 1:
-                    logger.info(f"Reintentando en {retry_delay} segundos...")
+                    logger.info("Reintentando en %s segundos...", retry_delay)
                     import time
                     time.sleep(retry_delay)
                 else:
@@ -124,7 +151,7 @@ class DatabaseManager:
                     battery_level=to_decimal_or_none(data.get('battery'))
                 )
                 session.add(device)
-                logger.info(f"➕ Nuevo dispositivo creado: {data['device_name']}")
+                logger.info("➕ Nuevo dispositivo creado: %s", data['device_name'])
             else:
                 device.last_seen = data.get('timestamp')
                 if data.get('battery'):
@@ -194,7 +221,7 @@ class DatabaseManager:
                 return None
                 
         except Exception as e:
-            logger.error(f"Error guardando en PostgreSQL: {e}", exc_info=True)
+            logger.error("Error guardando en PostgreSQL: %s", e, exc_info=True)
             if 'session' in locals():
                 session.rollback()
             return None
@@ -202,202 +229,373 @@ class DatabaseManager:
             if 'session' in locals():
                 session.close()
     
-    def save_to_redis(self, sensor_type, data):
-        """Guardar datos en Redis para acceso rápido - VERSIÓN COMPLETAMENTE CORREGIDA"""
+    def bulk_insert_measurements(self, sensor_type, rows):
+        """Guardar un lote de mediciones con INSERT multi-fila (execute_values).
+        
+        Devuelve la lista de IDs generados (en el mismo orden que rows) o None si
+        PostgreSQL rechaza el lote (datos inválidos). Los errores de conexión se
+        propagan: el lote es válido y debe reintentarse más tarde.
+        """
+        if not rows:
+            return []
+        
+        if sensor_type not in self.MEASUREMENT_COLUMNS:
+            logger.error("Tipo de sensor no soportado para inserción masiva: %s", sensor_type)
+            return None
+        
+        table, columns = self.MEASUREMENT_COLUMNS[sensor_type]
+        numeric_columns = self.NUMERIC_COLUMNS
+        
+        def to_float_or_none(value):
+            if value is None:
+                return None
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+        
+        conn = self.postgres_engine.raw_connection()
         try:
-            device_name = data['device_name']
+            cur = conn.cursor()
             
-            # Función mejorada para convertir cualquier valor a string seguro para Redis
-            def safe_str(value):
-                if value is None:
-                    return ''
-                if isinstance(value, datetime):
-                    return value.isoformat()
-                if isinstance(value, (int, float, str, bool)):
-                    return str(value)
-                # Para cualquier otro tipo, intentamos convertirlo
-                try:
-                    return str(value)
-                except:
-                    return ''
+            # 1. Crear o actualizar dispositivos (uno por nombre, gana la última lectura del lote)
+            devices = {}
+            for row in rows:
+                devices[row['device_name']] = (
+                    row['device_name'],
+                    sensor_type,
+                    to_float_or_none(row.get('latitude')),
+                    to_float_or_none(row.get('longitude')),
+                    row.get('timestamp'),
+                    to_float_or_none(row.get('battery'))
+                )
             
-            # **CORRECCIÓN CRÍTICA: Convertir TODOS los campos de data a strings seguros**
-            safe_data = {k: safe_str(v) for k, v in data.items()}
+            execute_values(
+                cur,
+                """
+                INSERT INTO devices (device_name, sensor_type, latitude, longitude, last_seen, battery_level)
+                VALUES %s
+                ON CONFLICT (device_name) DO UPDATE SET
+                    last_seen = EXCLUDED.last_seen,
+                    battery_level = COALESCE(EXCLUDED.battery_level, devices.battery_level),
+                    updated_at = NOW()
+                """,
+                list(devices.values())
+            )
             
-            # Convertir timestamp a string si es datetime
-            timestamp = data.get('timestamp')
-            if isinstance(timestamp, datetime):
-                timestamp_str = timestamp.isoformat()
-            elif timestamp is None:
-                timestamp_str = datetime.utcnow().isoformat()
-            else:
-                timestamp_str = safe_str(timestamp)
+            # 2. Insertar mediciones en un único statement y recuperar los IDs
+            values = [
+                tuple(
+                    to_float_or_none(row.get(column)) if column in numeric_columns else row.get(column)
+                    for column in columns
+                )
+                for row in rows
+            ]
             
-            # 1. Guardar última medición por dispositivo
-            device_key = f"device:{device_name}"
-            device_data = {
-                'sensor_type': sensor_type,
-                'last_update': timestamp_str,
-                'latitude': safe_data.get('latitude', ''),
-                'longitude': safe_data.get('longitude', ''),
-                'status': 'online'
-            }
+            returned = execute_values(
+                cur,
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s RETURNING id",
+                values,
+                page_size=len(values),
+                fetch=True
+            )
+            measurement_ids = [measurement_id for (measurement_id,) in returned]
             
-            # Agregar datos específicos según tipo
-            if sensor_type == 'aire':
-                device_data.update({
-                    'co2': safe_data.get('co2', ''),
-                    'temperature': safe_data.get('temperature', ''),
-                    'humidity': safe_data.get('humidity', ''),
-                    'air_quality': safe_data.get('air_quality_category', '')
-                })
-            elif sensor_type == 'sonido':
-                device_data.update({
-                    'laeq': safe_data.get('laeq', ''),
-                    'noise_category': safe_data.get('noise_category', '')
-                })
-            elif sensor_type == 'agua':
-                device_data.update({
-                    'water_level': safe_data.get('water_level', ''),
-                    'tank_status': safe_data.get('tank_status', '')
-                })
+            # 3. Alertas asociadas a cada medición
+            alerts = []
+            for row, measurement_id in zip(rows, measurement_ids):
+                for alert_data in self._build_alerts(sensor_type, row, measurement_id):
+                    alerts.append((row['device_name'], alert_data))
             
-            # **CORRECCIÓN: Convertir todos los valores a bytes ANTES de enviar a Redis**
-            device_data_bytes = {}
-            for key, value in device_data.items():
-                if isinstance(value, str):
-                    device_data_bytes[key] = value.encode('utf-8')
-                else:
-                    device_data_bytes[key] = str(value).encode('utf-8')
+            if alerts:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO alerts (
+                        device_name, sensor_type, alert_type, message, value, threshold, severity,
+                        air_measurement_id, sound_measurement_id, water_measurement_id
+                    ) VALUES %s
+                    """,
+                    [
+                        (
+                            device_name,
+                            sensor_type,
+                            alert_data['type'],
+                            alert_data['message'],
+                            alert_data['value'],
+                            alert_data['threshold'],
+                            alert_data['severity'],
+                            alert_data.get('air_measurement_id'),
+                            alert_data.get('sound_measurement_id'),
+                            alert_data.get('water_measurement_id')
+                        )
+                        for device_name, alert_data in alerts
+                    ]
+                )
             
-            self.redis_client.hset(device_key, mapping=device_data_bytes)
-            # self.redis_client.expire(device_key, 3600)
-            self.redis_client.expire(device_key, 2592000)    # 30 días
-
-            # 2. Guardar en lista de últimas mediciones
-            history_key = f"history:{sensor_type}:{device_name}"
-            history_data = {
-                'timestamp': timestamp_str,
-                'data': json.dumps(safe_data)  # Usamos safe_data que ya está convertido
-            }
+            conn.commit()
+            
+            for device_name, alert_data in alerts:
+                self._cache_alert(device_name, alert_data)
             
-            self.redis_client.lpush(history_key, json.dumps(history_data))
-            # self.redis_client.ltrim(history_key, 0, 49)
-            self.redis_client.ltrim(history_key, 0, 9999)    # 10,000 registros
+            return measurement_ids
+            
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            # Conexión caída: no es culpa de los datos
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        except Exception as e:
+            logger.error("Error en inserción masiva en PostgreSQL: %s", e, exc_info=True)
+            conn.rollback()
+            return None
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _safe_str(value):
+        """Convertir cualquier valor a string seguro para Redis"""
+        if value is None:
+            return ''
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, (int, float, str, bool)):
+            return str(value)
+        # Para cualquier otro tipo, intentamos convertirlo
+        try:
+            return str(value)
+        except:
+            return ''
+    
+    def _queue_redis_measurement(self, pipe, sensor_type, data):
+        """Encolar en un pipeline el hash del dispositivo y el historial de una medición"""
+        safe_str = self._safe_str
+        device_name = data['device_name']
+        
+        # Convertir TODOS los campos de data a strings seguros
+        safe_data = {k: safe_str(v) for k, v in data.items()}
+        
+        # Convertir timestamp a string si es datetime
+        timestamp = data.get('timestamp')
+        if isinstance(timestamp, datetime):
+            timestamp_str = timestamp.isoformat()
+        elif timestamp is None:
+            timestamp_str = datetime.utcnow().isoformat()
+        else:
+            timestamp_str = safe_str(timestamp)
+        
+        # 1. Guardar última medición por dispositivo
+        device_key = f"device:{device_name}"
+        device_data = {
+            'sensor_type': sensor_type,
+            'last_update': timestamp_str,
+            'latitude': safe_data.get('latitude', ''),
+            'longitude': safe_data.get('longitude', ''),
+            'status': 'online'
+        }
+        
+        # Agregar datos específicos según tipo
+        if sensor_type == 'aire':
+            device_data.update({
+                'co2': safe_data.get('co2', ''),
+                'temperature': safe_data.get('temperature', ''),
+                'humidity': safe_data.get('humidity', ''),
+                'air_quality': safe_data.get('air_quality_category', '')
+            })
+        elif sensor_type == 'sonido':
+            device_data.update({
+                'laeq': safe_data.get('laeq', ''),
+                'noise_category': safe_data.get('noise_category', '')
+            })
+        elif sensor_type == 'agua':
+            device_data.update({
+                'water_level': safe_data.get('water_level', ''),
+                'tank_status': safe_data.get('tank_status', '')
+            })
+        
+        # Convertir todos los valores a bytes ANTES de enviar a Redis
+        device_data_bytes = {key: value.encode('utf-8') for key, value in device_data.items()}
+        
+        pipe.hset(device_key, mapping=device_data_bytes)
+        pipe.expire(device_key, 2592000)    # 30 días
+        
+        # 2. Guardar en lista de últimas mediciones
+        history_key = f"history:{sensor_type}:{device_name}"
+        history_data = {
+            'timestamp': timestamp_str,
+            'data': orjson.dumps(safe_data).decode()  # Usamos safe_data que ya está convertido
+        }
+        
+        pipe.lpush(history_key, orjson.dumps(history_data))
+        pipe.ltrim(history_key, 0, 9999)    # 10,000 registros
+    
+    def save_to_redis(self, sensor_type, data):
+        """Guardar datos en Redis para acceso rápido"""
+        return self.bulk_redis(sensor_type, [data])
+    
+    def bulk_redis(self, sensor_type, rows):
+        """Guardar un lote de mediciones en Redis con un único pipeline (un round-trip)"""
+        if not rows:
+            return True
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            device_names = []
+            co2_scores = {}
+            
+            for data in rows:
+                device_name = data['device_name']
+                self._queue_redis_measurement(pipe, sensor_type, data)
+                device_names.append(device_name)
+                
+                # Valores para el dashboard rápido (solo para aire)
+                if sensor_type == 'aire':
+                    co2_value = data.get('co2')
+                    if co2_value is not None:
+                        try:
+                            co2_scores[device_name] = float(co2_value)
+                        except Exception as e:
+                            logger.warning("Error guardando en dashboard: %s", e)
             
             # 3. Actualizar set de dispositivos activos
             active_key = f"active_devices:{sensor_type}"
-            self.redis_client.sadd(active_key, device_name)
-            # self.redis_client.expire(active_key, 7200)
-            self.redis_client.expire(active_key, 2592000)    # 30 días
+            pipe.sadd(active_key, *device_names)
+            pipe.expire(active_key, 2592000)    # 30 días
             
-            # 4. Guardar para dashboard rápido (solo para aire)
-            if sensor_type == 'aire' and data.get('co2'):
-                co2_value = data.get('co2')
-                if co2_value is not None:
-                    try:
-                        dashboard_key = "dashboard:air_quality"
-                        self.redis_client.zadd(
-                            dashboard_key,
-                            {device_name: float(co2_value)}
-                        )
-                    except Exception as e:
-                        logger.warning(f"Error guardando en dashboard: {e}")
+            # 4. Guardar para dashboard rápido
+            if co2_scores:
+                pipe.zadd("dashboard:air_quality", co2_scores)
+            
+            pipe.execute()
             
-            logger.info(f"🔍 Cacheado en Redis: {sensor_type} - {device_name}")
+            logger.info("🔍 Cacheadas en Redis %s mediciones de %s", len(rows), sensor_type)
             return True
             
         except Exception as e:
-            logger.error(f"Error guardando en Redis: {e}", exc_info=True)
+            logger.error("Error guardando en Redis: %s", e, exc_info=True)
             # Log detallado para debugging
-            logger.error(f"Datos que causaron el error: sensor_type={sensor_type}, device_name={data.get('device_name')}")
-            logger.error(f"Tipos de datos: { {k: type(v) for k, v in data.items()} }")
+            logger.error("Lote que causó el error: sensor_type=%s, dispositivos=%s", sensor_type,
+                         sorted({data.get('device_name') for data in rows}, key=str))
             return False
     
-    def _check_alerts(self, session, sensor_type, data, measurement_id):
-        """Verificar y crear alertas si es necesario"""
-        try:
-            alerts_to_create = []
-            device_name = data['device_name']
+    def _build_alerts(self, sensor_type, data, measurement_id):
+        """Calcular las alertas que corresponden a una medición"""
+        alerts_to_create = []
+        
+        # Alertas específicas por tipo de sensor
+        if sensor_type == 'aire':
+            # CO2 alto
+            co2 = data.get('co2')
+            if co2 and co2 > 1000:
+                severity = 'high' if co2 > 2000 else 'medium'
+                alerts_to_create.append({
+                    'type': 'high_co2',
+                    'message': f'Nivel de CO2 elevado: {co2:.1f} ppm',
+                    'value': co2,
+                    'threshold': 1000,
+                    'severity': severity,
+                    'air_measurement_id': measurement_id
+                })
             
-            # Alertas específicas por tipo de sensor
-            if sensor_type == 'aire':
-                # CO2 alto
-                co2 = data.get('co2')
-                if co2 and co2 > 1000:
-                    severity = 'high' if co2 > 2000 else 'medium'
+            # Temperatura extrema
+            temperature = data.get('temperature')
+            if temperature:
+                if temperature > 30:
                     alerts_to_create.append({
-                        'type': 'high_co2',
-                        'message': f'Nivel de CO2 elevado: {co2:.1f} ppm',
-                        'value': co2,
-                        'threshold': 1000,
-                        'severity': severity,
+                        'type': 'high_temperature',
+                        'message': f'Temperatura alta: {temperature:.1f}°C',
+                        'value': temperature,
+                        'threshold': 30,
+                        'severity': 'medium',
                         'air_measurement_id': measurement_id
                     })
-                
-                # Temperatura extrema
-                temperature = data.get('temperature')
-                if temperature:
-                    if temperature > 30:
-                        alerts_to_create.append({
-                            'type': 'high_temperature',
-                            'message': f'Temperatura alta: {temperature:.1f}°C',
-                            'value': temperature,
-                            'threshold': 30,
-                            'severity': 'medium',
-                            'air_measurement_id': measurement_id
-                        })
-                    elif temperature < 10:
-                        alerts_to_create.append({
-                            'type': 'low_temperature',
-                            'message': f'Temperatura baja: {temperature:.1f}°C',
-                            'value': temperature,
-                            'threshold': 10,
-                            'severity': 'medium',
-                            'air_measurement_id': measurement_id
-                        })
-            
-            elif sensor_type == 'sonido':
-                # Ruido elevado
-                laeq = data.get('laeq')
-                if laeq and laeq > 75:
-                    severity = 'high' if laeq > 85 else 'medium'
-                    alerts_to_create.append({
-                        'type': 'high_noise',
-                        'message': f'Nivel de ruido elevado: {laeq:.1f} dB',
-                        'value': laeq,
-                        'threshold': 75,
-                        'severity': severity,
-                        'sound_measurement_id': measurement_id
-                    })
-            
-            elif sensor_type == 'agua':
-                # Nivel de agua bajo
-                water_level = data.get('water_level')
-                if water_level and water_level < 20:
-                    severity = 'high' if water_level < 10 else 'medium'
+                elif temperature < 10:
                     alerts_to_create.append({
-                        'type': 'low_water_level',
-                        'message': f'Nivel de agua bajo: {water_level:.1f}%',
-                        'value': water_level,
-                        'threshold': 20,
-                        'severity': severity,
-                        'water_measurement_id': measurement_id
+                        'type': 'low_temperature',
+                        'message': f'Temperatura baja: {temperature:.1f}°C',
+                        'value': temperature,
+                        'threshold': 10,
+                        'severity': 'medium',
+                        'air_measurement_id': measurement_id
                     })
-            
-            # Alerta de batería baja (para todos los sensores)
-            battery = data.get('battery')
-            if battery and battery < 20:
+        
+        elif sensor_type == 'sonido':
+            # Ruido elevado
+            laeq = data.get('laeq')
+            if laeq and laeq > 75:
+                severity = 'high' if laeq > 85 else 'medium'
+                alerts_to_create.append({
+                    'type': 'high_noise',
+                    'message': f'Nivel de ruido elevado: {laeq:.1f} dB',
+                    'value': laeq,
+                    'threshold': 75,
+                    'severity': severity,
+                    'sound_measurement_id': measurement_id
+                })
+        
+        elif sensor_type == 'agua':
+            # Nivel de agua bajo
+            water_level = data.get('water_level')
+            if water_level and water_level < 20:
+                severity = 'high' if water_level < 10 else 'medium'
                 alerts_to_create.append({
-                    'type': 'low_battery',
-                    'message': f'Batería baja: {battery:.1f}%',
-                    'value': battery,
+                    'type': 'low_water_level',
+                    'message': f'Nivel de agua bajo: {water_level:.1f}%',
+                    'value': water_level,
                     'threshold': 20,
-                    'severity': 'medium',
-                    'air_measurement_id': measurement_id if sensor_type == 'aire' else None,
-                    'sound_measurement_id': measurement_id if sensor_type == 'sonido' else None,
-                    'water_measurement_id': measurement_id if sensor_type == 'agua' else None
+                    'severity': severity,
+                    'water_measurement_id': measurement_id
                 })
+        
+        # Alerta de batería baja (para todos los sensores)
+        battery = data.get('battery')
+        if battery and battery < 20:
+            alerts_to_create.append({
+                'type': 'low_battery',
+                'message': f'Batería baja: {battery:.1f}%',
+                'value': battery,
+                'threshold': 20,
+                'severity': 'medium',
+                'air_measurement_id': measurement_id if sensor_type == 'aire' else None,
+                'sound_measurement_id': measurement_id if sensor_type == 'sonido' else None,
+                'water_measurement_id': measurement_id if sensor_type == 'agua' else None
+            })
+        
+        return alerts_to_create
+    
+    def _cache_alert(self, device_name, alert_data):
+        """Guardar la última alerta en Redis para alertas en tiempo real"""
+        alert_key = f"alert:{device_name}:{alert_data['type']}:latest"
+        alert_cache = {
+            'message': alert_data['message'],
+            'severity': alert_data['severity'],
+            'timestamp': datetime.utcnow().isoformat(),
+            'value': str(alert_data['value'])
+        }
+        
+        # Convertir a bytes para Redis
+        alert_cache_bytes = {}
+        for k, v in alert_cache.items():
+            if isinstance(v, str):
+                alert_cache_bytes[k] = v.encode('utf-8')
+            else:
+                alert_cache_bytes[k] = str(v).encode('utf-8')
+        
+        try:
+            self.redis_client.hset(alert_key, mapping=alert_cache_bytes)
+            self.redis_client.expire(alert_key, 3600)  # Expira en 1 hora
+        except Exception as e:
+            logger.warning("Error guardando alerta en Redis: %s", e)
+        
+        logger.warning("⚠️ Alerta creada: %s - %s", alert_data['type'], device_name)
+    
+    def _check_alerts(self, session, sensor_type, data, measurement_id):
+        """Verificar y crear alertas si es necesario"""
+        try:
+            alerts_to_create = self._build_alerts(sensor_type, data, measurement_id)
+            device_name = data['device_name']
             
             # Crear alertas en base de datos
             for alert_data in alerts_to_create:
@@ -416,34 +614,12 @@ class DatabaseManager:
                 session.add(alert)
                 
                 # También guardar en Redis para alertas en tiempo real
-                alert_key = f"alert:{device_name}:{alert_data['type']}:latest"
-                alert_cache = {
-                    'message': alert_data['message'],
-                    'severity': alert_data['severity'],
-                    'timestamp': datetime.utcnow().isoformat(),
-                    'value': str(alert_data['value'])
-                }
-                
-                # Convertir a bytes para Redis
-                alert_cache_bytes = {}
-                for k, v in alert_cache.items():
-                    if isinstance(v, str):
-                        alert_cache_bytes[k] = v.encode('utf-8')
-                    else:
-                        alert_cache_bytes[k] = str(v).encode('utf-8')
-                
-                try:
-                    self.redis_client.hset(alert_key, mapping=alert_cache_bytes)
-                    self.redis_client.expire(alert_key, 3600)  # Expira en 1 hora
-                except Exception as e:
-                    logger.warning(f"Error guardando alerta en Redis: {e}")
-                
-                logger.warning(f"⚠️ Alerta creada: {alert_data['type']} - {device_name}")
+                self._cache_alert(device_name, alert_data)
             
             return len(alerts_to_create) > 0
             
         except Exception as e:
-            logger.error(f"Error verificando alertas: {e}", exc_info=True)
+            logger.error("Error verificando alertas: %s", e, exc_info=True)
             return False
     
     def get_device_status(self, device_name):
@@ -463,11 +639,11 @@ class DatabaseManager:
                 self.postgres_engine.dispose()
                 logger.info("🔌 Conexión PostgreSQL cerrada")
         except Exception as e:
-            logger.error(f"Error cerrando PostgreSQL: {e}")
+            logger.error("Error cerrando PostgreSQL: %s", e)
         
         try:
             if self.redis_client:
                 self.redis_client.close()
                 logger.info("🔌 Conexión Redis cerrada")
         except Exception as e:
-            logger.error(f"Error cerrando Redis: {e}")
\ No newline at end of file
+            logger.error("Error cerrando Redis: %s", e)
\ No newline at end of file
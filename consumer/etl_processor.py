@@ -1,6 +1,6 @@
 # consumer/etl_processor.py
-import pandas as pd
-import numpy as np
+import math
+from bisect import bisect_right
 from datetime import datetime, timedelta
 import logging
 
@@ -10,6 +10,34 @@ logger = logging.getLogger(__name__)
 class ETLProcessor:
     """Procesador ETL para limpieza y transformación de datos IoT"""
     
+    # Rangos válidos de las variables de aire: columna -> (mínimo, máximo)
+    AIR_RANGES = {
+        'co2': (300, 5000),
+        'temperature': (-10, 50),
+        'humidity': (0, 100),
+        'pressure': (500, 1100),
+    }
+    
+    # Umbrales de categorización: límites superiores (exclusivos) y etiquetas
+    CO2_BINS = (450, 600, 1000, 2000)
+    AIR_QUALITY_LABELS = ("Excelente", "Buena", "Moderada", "Pobre", "Peligrosa")
+    TEMPERATURE_BINS = (15, 22, 26, 30)
+    TEMPERATURE_LABELS = ("Frío", "Fresco", "Confortable", "Cálido", "Caluroso")
+    NOISE_BINS = (50, 65, 75, 85)
+    NOISE_LABELS = ("Silencioso", "Moderado", "Ruidoso", "Muy ruidoso", "Peligroso")
+    TANK_BINS = (20, 40, 60, 80)
+    TANK_LABELS = ("Crítico", "Bajo", "Medio", "Alto", "Lleno")
+    
+    # Puntos de calidad de datos por campo presente (la ubicación exige latitud y longitud)
+    AIR_QUALITY_WEIGHTS = {'co2': 20, 'temperature': 20, 'humidity': 20, 'pressure': 10, 'battery': 10}
+    LOCATION_WEIGHT = 20
+    DATA_QUALITY_BINS = (50, 70, 90)  # Porcentaje mínimo (inclusivo) de cada nivel
+    DATA_QUALITY_LABELS = ("pobre", "moderada", "buena", "excelente")
+    
+    # Avisos por registro: se emite 1 de cada N para no saturar el log con lotes malos
+    WARNING_SAMPLE_RATE = 100
+    _warning_counts = {}
+    
     @staticmethod
     def process_air_data(data):
         """Procesar datos de aire con validaciones y transformaciones"""
@@ -18,23 +46,79 @@ class ETLProcessor:
         # 1. Validaciones básicas
         processed = ETLProcessor._validate_air_data(processed)
         
-        # 2. Calcular punto de rocío si hay temperatura y humedad
-        if processed.get('temperature') and processed.get('humidity'):
-            processed['dew_point'] = ETLProcessor._calculate_dew_point(
-                processed['temperature'], 
-                processed['humidity']
+        return ETLProcessor._enrich_air_data(processed)
+    
+    @staticmethod
+    def process_air_batch(records):
+        """Procesar un lote de datos de aire validando rangos de forma vectorizada"""
+        if not records:
+            return []
+        
+        # pandas solo se carga en el camino por lotes
+        import pandas as pd
+        
+        processed = [record.copy() for record in records]
+        
+        # 1. Validaciones básicas sobre todo el lote
+        df = ETLProcessor._validate_air_batch(pd.DataFrame.from_records(records))
+        for column in ETLProcessor.AIR_RANGES:
+            if column not in df:
+                continue
+            for record, value in zip(processed, df[column].tolist()):
+                record[column] = None if math.isnan(value) else value
+        
+        # 2. Categorizar todo el lote (categorías fijas y ordenadas)
+        categories = {}
+        if 'co2' in df:
+            categories['air_quality_category'] = ETLProcessor._categorize_batch(
+                df['co2'], ETLProcessor.CO2_BINS, ETLProcessor.AIR_QUALITY_LABELS
             )
+        if 'temperature' in df:
+            categories['temperature_category'] = ETLProcessor._categorize_batch(
+                df['temperature'], ETLProcessor.TEMPERATURE_BINS, ETLProcessor.TEMPERATURE_LABELS
+            )
+        
+        # 3. Calidad de datos de todo el lote
+        categories['data_quality'] = ETLProcessor._calculate_air_data_quality_batch(df)
         
-        # 3. Categorizar calidad del aire
-        if processed.get('co2'):
-            processed['air_quality_category'] = ETLProcessor._categorize_air_quality(processed['co2'])
+        for column, categorical in categories.items():
+            for record, label in zip(processed, categorical.tolist()):
+                if isinstance(label, str):
+                    record[column] = label
         
-        # 4. Categorizar temperatura
-        if processed.get('temperature'):
-            processed['temperature_category'] = ETLProcessor._categorize_temperature(processed['temperature'])
+        return [ETLProcessor._enrich_air_data(record, per_record=False) for record in processed]
+    
+    @staticmethod
+    def _categorize_batch(values, bins, labels):
+        """Categorizar una serie numérica como pd.Categorical ordenado (NaN si falta el valor)"""
+        import pandas as pd
         
-        # 5. Calcular calidad de datos
-        processed['data_quality'] = ETLProcessor._calculate_air_data_quality(processed)
+        edges = [-math.inf, *bins, math.inf]
+        return pd.cut(values, bins=edges, labels=labels, right=False, ordered=True)
+    
+    @staticmethod
+    def _enrich_air_data(processed, per_record=True):
+        """Agregar variables derivadas a un registro de aire ya validado.
+        Con per_record=False las categorías y la calidad ya vienen calculadas por lote"""
+        temperature = processed.get('temperature')
+        humidity = processed.get('humidity')
+        co2 = processed.get('co2')
+        
+        # 2. Calcular punto de rocío si hay temperatura y humedad
+        if temperature is not None and humidity is not None:
+            processed['dew_point'] = ETLProcessor._calculate_dew_point(temperature, humidity)
+        
+        if per_record:
+            # 3. Categorizar calidad del aire
+            if co2 is not None:
+                processed['air_quality_category'] = ETLProcessor._categorize_air_quality(co2)
+            
+            # 4. Categorizar temperatura
+            if temperature is not None:
+                processed['temperature_category'] = ETLProcessor._categorize_temperature(temperature)
+            
+            # 5. Calcular calidad de datos
+            processed['data_quality'] = ETLProcessor._calculate_air_data_quality(processed)
         
         return processed
     
@@ -42,24 +126,27 @@ class ETLProcessor:
     def process_sound_data(data):
         """Procesar datos de sonido"""
         processed = data.copy()
+        laeq = processed.get('laeq')
         
         # 1. Validar LAeq
-        if processed.get('laeq'):
-            if processed['laeq'] < 30 or processed['laeq'] > 120:
-                logger.warning(f"LAeq fuera de rango: {processed['laeq']}")
-                processed['laeq'] = None
+        if laeq is not None and not (30 <= laeq <= 120):
+            ETLProcessor.warn_sampled("laeq", "LAeq fuera de rango: %s", laeq)
+            laeq = processed['laeq'] = None
         
         # 2. Imputar LAeq si está vacío
-        if processed.get('laeq') is None and processed.get('lai'):
-            processed['laeq'] = processed['lai']
+        if laeq is None:
+            lai = processed.get('lai')
+            if lai is not None:
+                laeq = processed['laeq'] = lai
         
-        # 3. Categorizar ruido
-        if processed.get('laeq'):
-            processed['noise_category'] = ETLProcessor._categorize_noise(processed['laeq'])
-        
-        # 4. Calcular variabilidad
-        if processed.get('laimax') and processed.get('laeq'):
-            processed['noise_variation'] = processed['laimax'] - processed['laeq']
+        if laeq is not None:
+            # 3. Categorizar ruido
+            processed['noise_category'] = ETLProcessor._categorize_noise(laeq)
+            
+            # 4. Calcular variabilidad
+            laimax = processed.get('laimax')
+            if laimax is not None:
+                processed['noise_variation'] = laimax - laeq
         
         return processed
     
@@ -67,20 +154,23 @@ class ETLProcessor:
     def process_water_data(data):
         """Procesar datos de agua"""
         processed = data.copy()
+        water_level = processed.get('water_level')
         
         # 1. Calcular nivel de agua si no existe pero hay distancia
-        if processed.get('water_level') is None and processed.get('distance'):
-            processed['water_level'] = ETLProcessor._distance_to_percentage(processed['distance'])
+        if water_level is None:
+            distance = processed.get('distance')
+            if distance is not None:
+                water_level = processed['water_level'] = ETLProcessor._distance_to_percentage(distance)
         
         # 2. Validar nivel de agua
-        if processed.get('water_level'):
-            if processed['water_level'] < 0 or processed['water_level'] > 100:
-                logger.warning(f"Nivel de agua fuera de rango: {processed['water_level']}")
-                processed['water_level'] = None
+        if water_level is not None and not (0 <= water_level <= 100):
+            ETLProcessor.warn_sampled("water_level", "Nivel de agua fuera de rango: %s", water_level)
+            water_level = processed['water_level'] = None
         
         # 3. Interpretar código de estado
-        if processed.get('code'):
-            code_str = str(processed['code']).lower()
+        code = processed.get('code')
+        if code:
+            code_str = str(code).lower()
             if 'lleno' in code_str:
                 processed['estimated_level'] = 90
             elif 'medio' in code_str:
@@ -89,11 +179,22 @@ class ETLProcessor:
                 processed['estimated_level'] = 20
         
         # 4. Categorizar estado del tanque
-        if processed.get('water_level'):
-            processed['tank_status'] = ETLProcessor._categorize_tank_status(processed['water_level'])
+        if water_level is not None:
+            processed['tank_status'] = ETLProcessor._categorize_tank_status(water_level)
         
         return processed
     
+    @staticmethod
+    def parse_timestamp(timestamp):
+        """Parsear un timestamp ISO 8601"""
+        try:
+            # Python 3.11+ acepta el sufijo 'Z' sin reemplazos
+            return datetime.fromisoformat(timestamp)
+        except ValueError:
+            # Formatos no ISO: recurrir a pandas
+            import pandas as pd
+            return pd.to_datetime(timestamp).to_pydatetime()
+    
     @staticmethod
     def add_time_features(timestamp):
         """Agregar características temporales para análisis"""
@@ -102,54 +203,69 @@ class ETLProcessor:
         
         try:
             if isinstance(timestamp, str):
-                dt = pd.to_datetime(timestamp)
+                dt = ETLProcessor.parse_timestamp(timestamp)
             else:
                 dt = timestamp
             
             # Características cíclicas para modelos
-            hour_rad = 2 * np.pi * dt.hour / 24
+            hour_rad = 2 * math.pi * dt.hour / 24
+            day_of_week = dt.weekday()
             
             return {
                 'hour': dt.hour,
-                'day_of_week': dt.dayofweek,
+                'day_of_week': day_of_week,
                 'month': dt.month,
-                'is_weekend': 1 if dt.dayofweek >= 5 else 0,
+                'is_weekend': 1 if day_of_week >= 5 else 0,
                 'is_night': 1 if 22 <= dt.hour or dt.hour < 6 else 0,
                 'is_rush_hour': 1 if (7 <= dt.hour <= 9) or (17 <= dt.hour <= 19) else 0,
-                'hour_sin': np.sin(hour_rad),
-                'hour_cos': np.cos(hour_rad),
+                'hour_sin': math.sin(hour_rad),
+                'hour_cos': math.cos(hour_rad),
             }
         except Exception as e:
-            logger.error(f"Error procesando timestamp: {e}")
+            logger.error("Error procesando timestamp: %s", e)
             return {}
     
+    @staticmethod
+    def warn_sampled(key, message, *args):
+        """Emitir un aviso muestreado (el primero y luego 1 de cada WARNING_SAMPLE_RATE)"""
+        count = ETLProcessor._warning_counts.get(key, 0) + 1
+        ETLProcessor._warning_counts[key] = count
+        if count % ETLProcessor.WARNING_SAMPLE_RATE == 1:
+            logger.warning(message + " (%s ocurrencias)", *args, count)
+    
     # Métodos auxiliares privados
     @staticmethod
     def _validate_air_data(data):
         """Validar datos de aire"""
         validated = data.copy()
         
-        # CO2
-        if validated.get('co2'):
-            if validated['co2'] < 300 or validated['co2'] > 5000:
-                validated['co2'] = None
-        
-        # Temperatura
-        if validated.get('temperature'):
-            if validated['temperature'] < -10 or validated['temperature'] > 50:
-                validated['temperature'] = None
+        # CO2, temperatura, humedad y presión
+        for column, (low, high) in ETLProcessor.AIR_RANGES.items():
+            value = validated.get(column)
+            if value is not None and not (low <= value <= high):
+                validated[column] = None
         
-        # Humedad
-        if validated.get('humidity'):
-            if validated['humidity'] < 0 or validated['humidity'] > 100:
-                validated['humidity'] = None
+        return validated
+    
+    @staticmethod
+    def _validate_air_batch(df):
+        """Validar un lote de datos de aire: valores fuera de rango pasan a NaN"""
+        import pandas as pd
         
-        # Presión
-        if validated.get('pressure'):
-            if validated['pressure'] < 500 or validated['pressure'] > 1100:
-                validated['pressure'] = None
+        for column, (low, high) in ETLProcessor.AIR_RANGES.items():
+            if column not in df:
+                continue
+            
+            values = pd.to_numeric(df[column], errors='coerce')
+            mask = values.between(low, high)
+            out_of_range = int((values.notna() & ~mask).sum())
+            df[column] = values.where(mask)
+            
+            # Un solo log por lote y columna
+            if out_of_range:
+                logger.warning("%s valores de %s fuera de rango [%s, %s] en el lote", out_of_range, column, low, high)
         
-        return validated
+        return df
     
     @staticmethod
     def _calculate_dew_point(temperature, humidity):
@@ -160,7 +276,7 @@ class ETLProcessor:
                 return None
             a = 17.27
             b = 237.7
-            alpha = ((a * temperature) / (b + temperature)) + np.log(humidity/100.0)
+            alpha = ((a * temperature) / (b + temperature)) + math.log(humidity/100.0)
             dew_point = (b * alpha) / (a - alpha)
             return round(dew_point, 2)
         except:
@@ -169,58 +285,22 @@ class ETLProcessor:
     @staticmethod
     def _categorize_air_quality(co2):
         """Categorizar calidad del aire basado en CO2"""
-        if co2 < 450:
-            return "Excelente"
-        elif co2 < 600:
-            return "Buena"
-        elif co2 < 1000:
-            return "Moderada"
-        elif co2 < 2000:
-            return "Pobre"
-        else:
-            return "Peligrosa"
+        return ETLProcessor.AIR_QUALITY_LABELS[bisect_right(ETLProcessor.CO2_BINS, co2)]
     
     @staticmethod
     def _categorize_temperature(temp):
         """Categorizar temperatura"""
-        if temp < 15:
-            return "Frío"
-        elif temp < 22:
-            return "Fresco"
-        elif temp < 26:
-            return "Confortable"
-        elif temp < 30:
-            return "Cálido"
-        else:
-            return "Caluroso"
+        return ETLProcessor.TEMPERATURE_LABELS[bisect_right(ETLProcessor.TEMPERATURE_BINS, temp)]
     
     @staticmethod
     def _categorize_noise(laeq):
         """Categorizar nivel de ruido"""
-        if laeq < 50:
-            return "Silencioso"
-        elif laeq < 65:
-            return "Moderado"
-        elif laeq < 75:
-            return "Ruidoso"
-        elif laeq < 85:
-            return "Muy ruidoso"
-        else:
-            return "Peligroso"
+        return ETLProcessor.NOISE_LABELS[bisect_right(ETLProcessor.NOISE_BINS, laeq)]
     
     @staticmethod
     def _categorize_tank_status(water_level):
         """Categorizar estado del tanque"""
-        if water_level < 20:
-            return "Crítico"
-        elif water_level < 40:
-            return "Bajo"
-        elif water_level < 60:
-            return "Medio"
-        elif water_level < 80:
-            return "Alto"
-        else:
-            return "Lleno"
+        return ETLProcessor.TANK_LABELS[bisect_right(ETLProcessor.TANK_BINS, water_level)]
     
     @staticmethod
     def _distance_to_percentage(distance):
@@ -237,49 +317,30 @@ class ETLProcessor:
     def _calculate_air_data_quality(data):
         """Calcular score de calidad de datos de aire"""
         score = 0
-        total_possible = 0
-        
-        # CO2 (20 puntos)
-        if data.get('co2') is not None:
-            score += 20
-        total_possible += 20
-        
-        # Temperatura (20 puntos)
-        if data.get('temperature') is not None:
-            score += 20
-        total_possible += 20
-        
-        # Humedad (20 puntos)
-        if data.get('humidity') is not None:
-            score += 20
-        total_possible += 20
-        
-        # Presión (10 puntos - opcional)
-        if data.get('pressure') is not None:
-            score += 10
-        total_possible += 10
-        
-        # Batería (10 puntos)
-        if data.get('battery') is not None:
-            score += 10
-        total_possible += 10
-        
-        # Ubicación (20 puntos)
+        for field, weight in ETLProcessor.AIR_QUALITY_WEIGHTS.items():
+            if data.get(field) is not None:
+                score += weight
+        
+        # Ubicación
         if data.get('latitude') is not None and data.get('longitude') is not None:
-            score += 20
-        total_possible += 20
+            score += ETLProcessor.LOCATION_WEIGHT
         
-        # Calcular porcentaje
-        if total_possible > 0:
-            quality_percentage = (score / total_possible) * 100
-            
-            if quality_percentage >= 90:
-                return "excelente"
-            elif quality_percentage >= 70:
-                return "buena"
-            elif quality_percentage >= 50:
-                return "moderada"
-            else:
-                return "pobre"
+        # Los pesos suman 100: el score ya es un porcentaje
+        return ETLProcessor.DATA_QUALITY_LABELS[bisect_right(ETLProcessor.DATA_QUALITY_BINS, score)]
+    
+    @staticmethod
+    def _calculate_air_data_quality_batch(df):
+        """Calcular la calidad de datos de un lote de aire con máscaras de nulos por columna"""
+        import pandas as pd
+        
+        score = pd.Series(0, index=df.index)
+        for field, weight in ETLProcessor.AIR_QUALITY_WEIGHTS.items():
+            if field in df:
+                score += df[field].notna() * weight
+        
+        if 'latitude' in df and 'longitude' in df:
+            score += (df['latitude'].notna() & df['longitude'].notna()) * ETLProcessor.LOCATION_WEIGHT
         
-        return "desconocida"
\ No newline at end of file
+        # El score es un porcentaje: los umbrales son inclusivos por abajo (>= 90, >= 70, >= 50)
+        edges = [-math.inf, *ETLProcessor.DATA_QUALITY_BINS, math.inf]
+        return pd.cut(score, bins=edges, labels=ETLProcessor.DATA_QUALITY_LABELS, right=False, ordered=True)
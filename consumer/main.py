@@ -1,49 +1,211 @@
 # consumer/main.py
 import pika
+import orjson
 import json
 import time
+import queue
 import logging
+import logging.handlers
+import threading
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from config import RabbitMQConfig, DatabaseConfig, ConsumerConfig
 from database import DatabaseManager
 from etl_processor import ETLProcessor
 
-# Configurar logging
+# Configurar logging: los workers solo encolan registros y la escritura
+# a consola/disco la hace el hilo del QueueListener
+log_queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(
+    log_queue,
+    logging.StreamHandler(),
+    logging.FileHandler('consumer.log', delay=True)  # Sin abrir el archivo al importar en los procesos del pool
+)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('consumer.log')
-    ]
+    handlers=[logging.handlers.QueueHandler(log_queue)],
+    force=True
 )
 logger = logging.getLogger(__name__)
 
+# Marca para detener los workers
+_STOP = object()
+
+# Resultado del ETL de un mensaje
+ETL_OK = 'ok'              # Transformado, listo para guardar
+ETL_DISCARD = 'discard'    # Descartado: se confirma sin guardar
+ETL_REJECT = 'reject'      # Inválido: se rechaza sin reencolar
+ETL_RETRY = 'retry'        # Error transitorio: se rechaza y reencola
+
+# ETL por registro según tipo de sensor (el aire se procesa por lotes en transform_batch
+# y pasa por aquí solo si falla su lote)
+RECORD_HANDLERS = {
+    'aire': ETLProcessor.process_air_data,
+    'sonido': ETLProcessor.process_sound_data,
+    'agua': ETLProcessor.process_water_data,
+}
+
+def init_etl_worker(etl_log_queue):
+    """Inicializar logging en los procesos del pool de ETL: solo encolan los
+    registros y el proceso principal los escribe (un único escritor de consumer.log)"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.handlers.QueueHandler(etl_log_queue)],
+        force=True
+    )
+
+def decode_message(body):
+    """Decodificar un mensaje. Devuelve (message_id, sensor_type, data)"""
+    try:
+        message = orjson.loads(body)  # orjson acepta bytes directamente
+    except orjson.JSONDecodeError:
+        # Mensajes del productor anterior (json.dumps) pueden traer NaN/Infinity, que orjson rechaza
+        message = json.loads(body)
+    message_id = message.get('message_id', 'unknown')
+    sensor_type = message.get('sensor_type')
+    data = message.get('data', {})
+    
+    logger.debug("📥 Procesando mensaje %s - Sensor: %s - Dispositivo: %s", message_id, sensor_type, data.get('device_name', 'Unknown'))
+    
+    return message_id, sensor_type, data
+
+def finish_record(processed_data):
+    """Completar un registro transformado. Devuelve los datos o None si se descarta"""
+    # Validar primero lo barato: sin dispositivo no se parsea nada más
+    if not processed_data.get('device_name'):
+        ETLProcessor.warn_sampled("device_name", "Mensaje sin nombre de dispositivo, descartando...")
+        return None
+    
+    # Convertir timestamp string a datetime (un solo parseo por registro)
+    timestamp = processed_data.get('timestamp')
+    if isinstance(timestamp, str):
+        try:
+            timestamp = ETLProcessor.parse_timestamp(timestamp)
+        except Exception as e:
+            logger.warning("Error convirtiendo timestamp: %s", e)
+            timestamp = None
+    
+    # Agregar características temporales
+    processed_data.update(ETLProcessor.add_time_features(timestamp))
+    processed_data['timestamp'] = timestamp or datetime.utcnow()
+    
+    return processed_data
+
+def transform_message(message_id, sensor_type, data):
+    """ETL de un mensaje decodificado, registro a registro. Devuelve (estado, sensor_type, datos)"""
+    handler = RECORD_HANDLERS.get(sensor_type)
+    if handler is None:
+        logger.error("Tipo de sensor desconocido: %s", sensor_type)
+        return ETL_DISCARD, sensor_type, None
+    
+    try:
+        processed_data = finish_record(handler(data))
+        if processed_data is None:
+            return ETL_DISCARD, sensor_type, None
+        return ETL_OK, sensor_type, processed_data
+    
+    except Exception as e:
+        # Error determinista del propio mensaje: reencolarlo fallaría siempre igual
+        logger.error("❌ Error procesando mensaje %s: %s", message_id, e)
+        return ETL_REJECT, sensor_type, None
+
+def transform_batch(bodies):
+    """ETL de un lote de mensajes crudos (se ejecuta en el pool de procesos).
+    Devuelve una lista alineada con bodies de (estado, sensor_type, datos)"""
+    results = [None] * len(bodies)
+    air_messages = []
+    
+    for index, body in enumerate(bodies):
+        try:
+            message_id, sensor_type, data = decode_message(body)
+        except json.JSONDecodeError as e:  # También cubre orjson.JSONDecodeError
+            logger.error("❌ Error decodificando JSON: %s", e)
+            results[index] = (ETL_REJECT, None, None)
+            continue
+        except Exception as e:
+            logger.error("❌ Error procesando mensaje: %s", e)
+            results[index] = (ETL_REJECT, None, None)
+            continue
+        
+        if sensor_type == 'aire':
+            # El aire se valida por lotes
+            air_messages.append((index, message_id, data))
+        else:
+            # Sonido/agua por registro; tipos desconocidos se descartan
+            results[index] = transform_message(message_id, sensor_type, data)
+    
+    if air_messages:
+        try:
+            processed = ETLProcessor.process_air_batch([data for _, _, data in air_messages])
+        except Exception as e:
+            logger.error("❌ Error procesando lote de aire, reintentando registro a registro: %s", e)
+            processed = None
+        
+        for position, (index, message_id, data) in enumerate(air_messages):
+            if processed is None:
+                # Registro a registro: solo el mensaje defectuoso queda rechazado
+                results[index] = transform_message(message_id, 'aire', data)
+                continue
+            try:
+                processed_data = finish_record(processed[position])
+            except Exception as e:
+                logger.error("❌ Error procesando mensaje %s: %s", message_id, e)
+                results[index] = (ETL_REJECT, 'aire', None)
+                continue
+            if processed_data is None:
+                results[index] = (ETL_DISCARD, 'aire', None)
+            else:
+                results[index] = (ETL_OK, 'aire', processed_data)
+    
+    return results
+
 class Consumer:
     """Consumidor que procesa mensajes de RabbitMQ"""
     # Configuración
     rabbit_config = RabbitMQConfig()
     db_config = DatabaseConfig()
-
-    def __init__(self, rabbit_config: RabbitMQConfig, db_config: DatabaseConfig):
+    
+    def __init__(self, rabbit_config: RabbitMQConfig, db_config: DatabaseConfig,
+                 consumer_config: ConsumerConfig = None):
         self.rabbit_config = rabbit_config
         self.db_config = db_config
+        self.consumer_config = consumer_config or ConsumerConfig()
         self.db_manager = None
         self.connection = None
-        self.channel = None
+        self.channels = {}  # Un canal por cola: los delivery tags y los acks son por canal
         self.processed_count = 0
         self.error_count = 0
+        self._stats_lock = threading.Lock()
         
+        # Estado de la conexión asíncrona
+        self._ready = False
+        self._connect_error = None
+        self._closing = False
+        
+        # Una cola de trabajo y un worker por cola de RabbitMQ:
+        # el hilo de red solo encola, los workers hacen ETL + guardado
+        self.work_queues = {sensor_type: queue.Queue() for sensor_type in self.rabbit_config.queue_names}
+        self.workers = []
+        
+        # Pool de procesos para el ETL (fuera del GIL del proceso principal)
+        self.executor = None
+        self.etl_log_listener = None
+        self._etl_log_queue = None
+        self._executor_lock = threading.Lock()
+    
     def connect_rabbitmq(self):
         """Conectar a RabbitMQ con reintentos"""
         max_retries = 5
         retry_delay = 5
         
-
-        
         for attempt in range(max_retries):
             try:
-                logger.info(f"Conectando a RabbitMQ (intento {attempt + 1}/{max_retries})...")
+                logger.info("Conectando a RabbitMQ (intento %s/%s)...", attempt + 1, max_retries)
                 
                 credentials = pika.PlainCredentials(
                     self.rabbit_config.username,
@@ -60,35 +222,92 @@ class Consumer:
                     retry_delay=3
                 )
                 
-                self.connection = pika.BlockingConnection(parameters)
-                self.channel = self.connection.channel()
+                self._ready = False
+                self._connect_error = None
+                self._pending_channels = set(self.rabbit_config.queue_names)
+                self.connection = pika.SelectConnection(
+                    parameters,
+                    on_open_callback=self._on_connection_open,
+                    on_open_error_callback=self._on_connection_open_error,
+                    on_close_callback=self._on_connection_closed
+                )
                 
-                # Declarar colas
-                for queue_name in self.rabbit_config.queue_names.values():
-                    self.channel.queue_declare(
-                        queue=queue_name,
-                        durable=True,
-                        arguments={
-                            'x-message-ttl': 86400000  # 24 horas en ms - ¡IGUAL QUE PRODUCER!
-                        }
-                    )
-
+                # Ejecutar el ioloop hasta que los canales estén listos (o falle la conexión)
+                self.connection.ioloop.start()
                 
-                # QoS: procesar un mensaje a la vez
-                self.channel.basic_qos(prefetch_count=1)
+                if not self._ready:
+                    raise ConnectionError(self._connect_error or "Conexión cerrada durante la configuración")
                 
                 logger.info("✅ Conectado a RabbitMQ exitosamente")
                 return True
-                
+            
             except Exception as e:
-                logger.error(f"Error conectando a RabbitMQ: {e}")
+                logger.error("Error conectando a RabbitMQ: %s", e)
                 if attempt < max_retries - 1:
-                    logger.info(f"Reintentando en {retry_delay} segundos...")
+                    logger.info("Reintentando en %s segundos...", retry_delay)
                     time.sleep(retry_delay)
                 else:
                     logger.error("❌ No se pudo conectar a RabbitMQ después de varios intentos")
                     return False
     
+    def _on_connection_open(self, connection):
+        """Conexión abierta: abrir un canal por cola"""
+        for sensor_type in self.rabbit_config.queue_names:
+            connection.channel(on_open_callback=functools.partial(self._on_channel_open, sensor_type))
+    
+    def _on_connection_open_error(self, connection, error):
+        """No se pudo abrir la conexión"""
+        self._connect_error = error
+        connection.ioloop.stop()
+    
+    def _on_connection_closed(self, connection, reason):
+        """Conexión cerrada: detener el ioloop"""
+        if not self._closing:
+            logger.warning("Conexión RabbitMQ cerrada: %s", reason)
+        self.channels = {}
+        connection.ioloop.stop()
+    
+    def _on_channel_open(self, sensor_type, channel):
+        """Canal abierto: declarar su cola"""
+        self.channels[sensor_type] = channel
+        channel.add_on_close_callback(functools.partial(self._on_channel_closed, sensor_type))
+        channel.queue_declare(
+            queue=self.rabbit_config.queue_names[sensor_type],
+            durable=True,
+            arguments={
+                'x-message-ttl': 86400000  # 24 horas en ms - ¡IGUAL QUE PRODUCER!
+            },
+            callback=functools.partial(self._on_queue_declared, sensor_type)
+        )
+    
+    def _on_channel_closed(self, sensor_type, channel, reason):
+        """Canal cerrado: sus delivery tags ya no se pueden confirmar, detener el consumidor"""
+        if self.channels.get(sensor_type) is channel:
+            del self.channels[sensor_type]
+        if self._closing:
+            return
+        
+        # Sin canal los acks se pierden y la ventana de prefetch se llenaría en silencio;
+        # al cerrar la conexión termina start_consuming y RabbitMQ reentrega lo no confirmado
+        logger.error("❌ Canal de %s cerrado: %s. Deteniendo consumidor...", sensor_type, reason)
+        if not (self.connection.is_closing or self.connection.is_closed):
+            self.connection.close()
+    
+    def _on_queue_declared(self, sensor_type, _frame):
+        """Cola declarada: configurar QoS del canal"""
+        # QoS: mensajes en vuelo suficientes para llenar varios lotes
+        self.channels[sensor_type].basic_qos(
+            prefetch_count=self.consumer_config.prefetch_count,
+            callback=functools.partial(self._on_qos_ok, sensor_type)
+        )
+    
+    def _on_qos_ok(self, sensor_type, _frame):
+        """Canal listo para consumir"""
+        self._pending_channels.discard(sensor_type)
+        if not self._pending_channels:
+            self._ready = True
+            self.connection.ioloop.stop()
+    
     def connect_databases(self):
         """Conectar a bases de datos"""
         logger.info("Conectando a bases de datos...")
@@ -108,151 +327,304 @@ class Consumer:
         logger.info("✅ Conectado a todas las bases de datos")
         return True
     
-    def process_message(self, ch, method, properties, body):
-        """Procesar un mensaje recibido de RabbitMQ"""
-        message_id = None
-        sensor_type = None
-        
-        try:
-            # Decodificar mensaje
-            message = json.loads(body.decode())
-            message_id = message.get('message_id', 'unknown')
-            sensor_type = message.get('sensor_type')
-            data = message.get('data', {})
-            produced_at = message.get('produced_at')
-            
-            logger.info(f"📥 Procesando mensaje {message_id} - Sensor: {sensor_type} - Dispositivo: {data.get('device_name', 'Unknown')}")
+    def on_message(self, sensor_type, ch, method, properties, body):
+        """Callback del ioloop: solo encola el mensaje para su worker"""
+        self.work_queues[sensor_type].put((method.delivery_tag, body))
+    
+    def _ack(self, sensor_type, delivery_tag, multiple):
+        """Confirmar mensajes (siempre desde el hilo del ioloop)"""
+        channel = self.channels.get(sensor_type)
+        if channel and channel.is_open:
+            channel.basic_ack(delivery_tag=delivery_tag, multiple=multiple)
+    
+    def _nack(self, sensor_type, delivery_tag, requeue):
+        """Rechazar un mensaje (siempre desde el hilo del ioloop)"""
+        channel = self.channels.get(sensor_type)
+        if channel and channel.is_open:
+            channel.basic_nack(delivery_tag=delivery_tag, requeue=requeue)
+    
+    def ack(self, sensor_type, delivery_tag, multiple=False):
+        """Programar la confirmación de mensajes desde un worker"""
+        self.connection.add_callback_threadsafe(functools.partial(self._ack, sensor_type, delivery_tag, multiple))
+    
+    def nack(self, sensor_type, delivery_tag, requeue):
+        """Programar el rechazo de un mensaje desde un worker"""
+        self.connection.add_callback_threadsafe(functools.partial(self._nack, sensor_type, delivery_tag, requeue))
+    
+    def _count(self, processed=0, errors=0):
+        """Actualizar estadísticas de forma segura entre hilos"""
+        with self._stats_lock:
+            previous_count = self.processed_count
+            self.processed_count += processed
+            self.error_count += errors
             
-            # Validar tipo de sensor
-            if sensor_type not in ['aire', 'sonido', 'agua']:
-                logger.error(f"Tipo de sensor desconocido: {sensor_type}")
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                return
+            # Log cada 100 mensajes procesados
+            if self.processed_count // 100 > previous_count // 100 and logger.isEnabledFor(logging.INFO):
+                logger.info("📊 Estadísticas: %s mensajes procesados, %s errores", self.processed_count, self.error_count)
+    
+    def _insert_rows(self, sensor_type, rows):
+        """Insertar filas en PostgreSQL. Devuelve un estado por fila: ETL_OK (guardada),
+        ETL_REJECT (PostgreSQL la rechaza) o ETL_RETRY (error de conexión)"""
+        try:
+            postgres_ids = self.db_manager.bulk_insert_measurements(sensor_type, rows)
+        except Exception as e:
+            logger.error("❌ Error de conexión guardando %s registros de %s: %s", len(rows), sensor_type, e)
+            return [ETL_RETRY] * len(rows)
+        
+        if postgres_ids is not None:
+            return [ETL_OK] * len(rows)
+        
+        if len(rows) == 1:
+            logger.error("❌ Registro de %s rechazado por PostgreSQL, se descarta sin reencolar: %s",
+                         sensor_type, rows[0].get('device_name'))
+            return [ETL_REJECT]
+        
+        # Una fila inválida revierte todo el lote: reintentar fila a fila para aislarla
+        logger.warning("Lote de %s rechazado por PostgreSQL, reintentando %s registros uno a uno", sensor_type, len(rows))
+        return [status for row in rows for status in self._insert_rows(sensor_type, [row])]
+    
+    def flush_batch(self, sensor_type, rows):
+        """Guardar un lote de un tipo de sensor. Devuelve un estado por fila (ver _insert_rows)"""
+        if not rows:
+            return []
+        
+        # Una sola inserción multi-fila por lote (fila a fila solo si el lote falla)
+        statuses = self._insert_rows(sensor_type, rows)
+        saved_rows = [row for row, status in zip(rows, statuses) if status == ETL_OK]
+        errors = len(rows) - len(saved_rows)
+        
+        if saved_rows:
+            logger.info("💾 Guardado lote de %s mediciones de %s en PostgreSQL", len(saved_rows), sensor_type)
             
-            # Aplicar ETL según tipo de sensor
-            if sensor_type == 'aire':
-                processed_data = ETLProcessor.process_air_data(data)
-            elif sensor_type == 'sonido':
-                processed_data = ETLProcessor.process_sound_data(data)
-            elif sensor_type == 'agua':
-                processed_data = ETLProcessor.process_water_data(data)
+            # Un solo pipeline de Redis por lote
+            try:
+                redis_ok = self.db_manager.bulk_redis(sensor_type, saved_rows)
+            except Exception as e:
+                logger.error("❌ Error guardando lote de %s en Redis: %s", sensor_type, e)
+                redis_ok = False
+            if not redis_ok:
+                logger.warning("No se pudo guardar en Redis")
+                errors += len(saved_rows)
+        
+        self._count(processed=len(saved_rows), errors=errors)
+        return statuses
+    
+    def run_etl(self, bodies):
+        """Ejecutar el ETL de un lote en el pool de procesos (o en línea si no hay pool)"""
+        executor = self.executor
+        if executor is None:
+            return transform_batch(bodies)
+        
+        try:
+            return executor.submit(transform_batch, bodies).result()
+        except BrokenProcessPool:
+            # Un proceso hijo murió (OOM, segfault): el pool queda inservible para siempre
+            with self._executor_lock:
+                if self.executor is executor:  # Otro worker puede haberlo recreado ya
+                    logger.error("💥 Pool de ETL roto, recreándolo...")
+                    executor.shutdown(wait=False)
+                    self.executor = self._create_etl_pool()
+                executor = self.executor
+            return executor.submit(transform_batch, bodies).result()
+    
+    def _create_etl_pool(self):
+        """Crear el pool de procesos de ETL"""
+        return ProcessPoolExecutor(
+            max_workers=self.consumer_config.etl_workers,
+            mp_context=multiprocessing.get_context('spawn'),  # sin fork de un proceso con hilos
+            initializer=init_etl_worker,
+            initargs=(self._etl_log_queue,)
+        )
+    
+    def process_batch(self, queue_type, items, settled):
+        """ETL + guardado de un lote de mensajes crudos [(delivery_tag, body)] de una cola.
+        Añade a settled los delivery tags ya confirmados o rechazados"""
+        if not items:
+            return
+        
+        results = self.run_etl([body for _, body in items])
+        
+        batches = {}
+        to_ack = []
+        for (delivery_tag, _), (status, sensor_type, processed_data) in zip(items, results):
+            if status == ETL_OK:
+                delivery_tags, rows = batches.setdefault(sensor_type, ([], []))
+                delivery_tags.append(delivery_tag)
+                rows.append(processed_data)
+            elif status == ETL_DISCARD:
+                to_ack.append(delivery_tag)
             else:
-                logger.error(f"Tipo de sensor no implementado: {sensor_type}")
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                return
+                self.nack(queue_type, delivery_tag, requeue=(status == ETL_RETRY))
+                settled.add(delivery_tag)
+                self._count(errors=1)
+        
+        for sensor_type, (delivery_tags, rows) in batches.items():
+            # Solo los errores de conexión se reencolan; las filas rechazadas no vuelven a la cola
+            for delivery_tag, status in zip(delivery_tags, self.flush_batch(sensor_type, rows)):
+                if status == ETL_OK:
+                    to_ack.append(delivery_tag)
+                else:
+                    self.nack(queue_type, delivery_tag, requeue=(status == ETL_RETRY))
+                    settled.add(delivery_tag)
+        
+        # Un solo ack acumulativo por lote: los rechazos ya se enviaron antes y
+        # el canal es exclusivo de esta cola, así que no hay tags ajenos pendientes
+        if to_ack:
+            self.ack(queue_type, max(to_ack), multiple=True)
+            settled.update(to_ack)
+    
+    def _worker(self, sensor_type):
+        """Worker: agrupa mensajes de su cola y los procesa por lotes"""
+        work_queue = self.work_queues[sensor_type]
+        batch_size = self.consumer_config.batch_size
+        flush_interval = self.consumer_config.flush_interval
+        batch = []
+        deadline = None
+        stopping = False
+        
+        while not stopping:
+            timeout = flush_interval if not batch else max(0.0, deadline - time.monotonic())
+            try:
+                item = work_queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
             
-            # Agregar características temporales
-            time_features = ETLProcessor.add_time_features(processed_data.get('timestamp'))
-            processed_data.update(time_features)
+            # Drenar sin bloquear lo que ya esté encolado (una espera con timeout por lote, no por mensaje)
+            while item is not None:
+                if item is _STOP:
+                    stopping = True
+                    break
+                if not batch:
+                    deadline = time.monotonic() + flush_interval
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    break
+                try:
+                    item = work_queue.get_nowait()
+                except queue.Empty:
+                    item = None
             
-            # Convertir timestamp string a datetime
-            if processed_data.get('timestamp'):
+            # Vaciar al llenarse el lote, al vencer el intervalo o al detenerse
+            if batch and (stopping or len(batch) >= batch_size or time.monotonic() >= deadline):
+                channel = self.channels.get(sensor_type)
+                if channel is None or not channel.is_open:
+                    # Sin canal no hay ack posible: guardarlos duplicaría lo que RabbitMQ reentregará
+                    logger.warning("Canal de %s cerrado, se descartan %s mensajes sin confirmar", sensor_type, len(batch))
+                    batch = []
+                    continue
+                
+                settled = set()
                 try:
-                    if isinstance(processed_data['timestamp'], str):
-                        processed_data['timestamp'] = datetime.fromisoformat(
-                            processed_data['timestamp'].replace('Z', '+00:00')
-                        )
+                    self.process_batch(sensor_type, batch, settled)
                 except Exception as e:
-                    logger.warning(f"Error convirtiendo timestamp: {e}")
-                    processed_data['timestamp'] = datetime.utcnow()
-            else:
-                processed_data['timestamp'] = datetime.utcnow()
-            
-            # Validar que haya datos mínimos
-            if not processed_data.get('device_name'):
-                logger.warning("Mensaje sin nombre de dispositivo, descartando...")
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                return
-            
-            # Guardar en bases de datos
-            postgres_id = self.db_manager.save_to_postgres(sensor_type, processed_data)
-            redis_ok = self.db_manager.save_to_redis(sensor_type, processed_data)
-            
-            # Estadísticas
-            self.processed_count += 1
-            
-            if postgres_id:
-                logger.info(f"💾 Guardado en PostgreSQL (ID: {postgres_id})")
-            else:
-                logger.warning("No se pudo guardar en PostgreSQL")
-                self.error_count += 1
-            
-            if redis_ok:
-                logger.debug("Caché actualizado en Redis")
-            else:
-                logger.warning("No se pudo guardar en Redis")
-                self.error_count += 1
-            
-            # Log cada 100 mensajes procesados
-            if self.processed_count % 100 == 0:
-                logger.info(f"📊 Estadísticas: {self.processed_count} mensajes procesados, {self.error_count} errores")
-            
-            # Confirmar procesamiento del mensaje
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            logger.debug(f"✅ Mensaje {message_id} procesado exitosamente")
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"❌ Error decodificando JSON: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-            self.error_count += 1
+                    logger.error("💥 Error en worker de %s: %s", sensor_type, e)
+                    # Solo los no resueltos: un tag confirmado dos veces cierra el canal
+                    for delivery_tag, _ in batch:
+                        if delivery_tag not in settled:
+                            self.nack(sensor_type, delivery_tag, requeue=True)
+                batch = []
+    
+    def start_workers(self):
+        """Arrancar el pool de ETL y un worker por cola"""
+        if self.consumer_config.etl_workers > 0:
+            # Los logs de los procesos del pool llegan por una cola entre procesos
+            # y los escriben los mismos handlers que los del proceso principal
+            self._etl_log_queue = multiprocessing.get_context('spawn').Queue(-1)
+            self.etl_log_listener = logging.handlers.QueueListener(self._etl_log_queue, *log_listener.handlers)
+            self.etl_log_listener.start()
             
-        except Exception as e:
-            logger.error(f"❌ Error procesando mensaje {message_id}: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
-            self.error_count += 1
+            self.executor = self._create_etl_pool()
+        
+        for sensor_type in self.work_queues:
+            worker = threading.Thread(
+                target=self._worker,
+                args=(sensor_type,),
+                name=f"worker-{sensor_type}",
+                daemon=True
+            )
+            worker.start()
+            self.workers.append(worker)
+    
+    def stop_workers(self):
+        """Detener los workers vaciando sus lotes pendientes"""
+        for work_queue in self.work_queues.values():
+            work_queue.put(_STOP)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        
+        if self.etl_log_listener is not None:
+            self.etl_log_listener.stop()
+            self.etl_log_listener = None
     
     def start_consuming(self):
         """Iniciar consumo de mensajes"""
         logger.info("🚀 Iniciando consumidor IoT...")
         
         try:
+            self.start_workers()
+            
             # Configurar callbacks para cada cola
             for sensor_type, queue_name in self.rabbit_config.queue_names.items():
-                self.channel.basic_consume(
+                self.channels[sensor_type].basic_consume(
                     queue=queue_name,
-                    on_message_callback=self.process_message,
+                    on_message_callback=functools.partial(self.on_message, sensor_type),
                     auto_ack=False
                 )
-                logger.info(f"👂 Escuchando cola: {queue_name}")
+                logger.info("👂 Escuchando cola: %s", queue_name)
             
             logger.info("✅ Consumidor listo. Esperando mensajes...")
-            self.channel.start_consuming()
-            
+            self.connection.ioloop.start()
+        
         except KeyboardInterrupt:
             logger.info("🛑 Deteniendo consumidor...")
-            self.channel.stop_consuming()
         except Exception as e:
-            logger.error(f"💥 Error en el consumidor: {e}")
+            logger.error("💥 Error en el consumidor: %s", e)
         finally:
             self.close()
     
     def close(self):
         """Cerrar conexiones de manera segura"""
+        try:
+            self.stop_workers()
+        except Exception as e:
+            logger.error("Error deteniendo workers: %s", e)
+        
         try:
             if self.connection and not self.connection.is_closed:
-                self.connection.close()
+                # Cerrar después de enviar los acks pendientes de los workers
+                self._closing = True
+                self.connection.add_callback_threadsafe(self.connection.close)
+                self.connection.ioloop.start()
                 logger.info("🔌 Conexión RabbitMQ cerrada")
         except Exception as e:
-            logger.error(f"Error cerrando RabbitMQ: {e}")
+            logger.error("Error cerrando RabbitMQ: %s", e)
         
         try:
             if self.db_manager:
                 self.db_manager.close()
         except Exception as e:
-            logger.error(f"Error cerrando bases de datos: {e}")
+            logger.error("Error cerrando bases de datos: %s", e)
         
         # Resumen final
-        logger.info(f"📊 RESUMEN FINAL: {self.processed_count} mensajes procesados, {self.error_count} errores")
+        logger.info("📊 RESUMEN FINAL: %s mensajes procesados, %s errores", self.processed_count, self.error_count)
 
 def main():
     """Función principal del consumidor"""
+    log_listener.start()
+    
     try:
         # Configuración
         rabbit_config = RabbitMQConfig()
         db_config = DatabaseConfig()
-                
+        consumer_config = ConsumerConfig()
+        
         # Crear consumidor
-        consumer = Consumer(rabbit_config, db_config)
+        consumer = Consumer(rabbit_config, db_config, consumer_config)
         
         logger.info("=" * 50)
         logger.info("CONSUMIDOR IoT - SISTEMA DE MONITOREO")
@@ -271,9 +643,11 @@ def main():
         
         # Iniciar consumo
         consumer.start_consuming()
-        
+    
     except Exception as e:
-        logger.error(f"Error en main: {e}")
+        logger.error("Error en main: %s", e)
+    finally:
+        log_listener.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -52,18 +52,18 @@ class AirMeasurement(Base):
     id = Column(Integer, primary_key=True)
     device_name = Column(String(100), ForeignKey('devices.device_name'), nullable=False, index=True)
     timestamp = Column(DateTime, nullable=False, index=True)
-    latitude = Column(DECIMAL(10, 8))  # CAMBIADO
-    longitude = Column(DECIMAL(11, 8))  # CAMBIADO
+    latitude = Column(Float)
+    longitude = Column(Float)
     
-    # Mediciones
-    co2 = Column(DECIMAL(6, 2))  # CAMBIADO: Float -> DECIMAL
-    temperature = Column(DECIMAL(4, 2))  # CAMBIADO
-    humidity = Column(DECIMAL(5, 2))  # CAMBIADO
-    pressure = Column(DECIMAL(7, 2))  # CAMBIADO
-    battery = Column(DECIMAL(5, 2))  # CAMBIADO
+    # Mediciones (Float: lecturas de sensor de baja precisión, sin coste de Decimal)
+    co2 = Column(Float)  # ppm
+    temperature = Column(Float)  # °C
+    humidity = Column(Float)  # %
+    pressure = Column(Float)  # hPa
+    battery = Column(Float)  # %
     
-    # Calidad de señal - AÑADIDO (faltaba)
-    rssi = Column(DECIMAL(5, 2))  # AÑADIDO: Esta columna existe en SQL
+    # Calidad de señal
+    rssi = Column(Float)  # dBm
     
     data_quality = Column(String(20), default='good')
     
@@ -85,12 +85,12 @@ class AirMeasurement(Base):
             'id': self.id,
             'device_name': self.device_name,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
-            'co2': float(self.co2) if self.co2 else None,
-            'temperature': float(self.temperature) if self.temperature else None,
-            'humidity': float(self.humidity) if self.humidity else None,
-            'pressure': float(self.pressure) if self.pressure else None,
-            'battery': float(self.battery) if self.battery else None,
-            'rssi': float(self.rssi) if self.rssi else None,  # AÑADIDO
+            'co2': self.co2,
+            'temperature': self.temperature,
+            'humidity': self.humidity,
+            'pressure': self.pressure,
+            'battery': self.battery,
+            'rssi': self.rssi,
             'air_quality_category': self.air_quality_category,
             'temperature_category': self.temperature_category,
             'created_at': self.created_at.isoformat() if self.created_at else None
@@ -187,8 +187,8 @@ class Alert(Base):
     sensor_type = Column(String(50), nullable=False)
     alert_type = Column(String(50), nullable=False)
     message = Column(Text, nullable=False)
-    value = Column(DECIMAL(10, 2))  # CAMBIADO: Float -> DECIMAL
-    threshold = Column(DECIMAL(10, 2))  # CAMBIADO: Float -> DECIMAL
+    value = Column(Float)
+    threshold = Column(Float)
     severity = Column(String(20))
     
     # Columnas específicas por tipo de medición
@@ -212,8 +212,8 @@ class Alert(Base):
             'sensor_type': self.sensor_type,
             'alert_type': self.alert_type,
             'message': self.message,
-            'value': float(self.value) if self.value else None,
-            'threshold': float(self.threshold) if self.threshold else None,
+            'value': self.value,
+            'threshold': self.threshold,
             'severity': self.severity,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
             'is_resolved': self.is_resolved,
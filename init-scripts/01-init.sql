@@ -22,18 +22,18 @@ CREATE TABLE IF NOT EXISTS air_measurements (
     id SERIAL PRIMARY KEY,
     device_name VARCHAR(100) NOT NULL,
     timestamp TIMESTAMPTZ NOT NULL,
-    latitude DECIMAL(10, 8),
-    longitude DECIMAL(11, 8),
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
     
     -- Mediciones principales
-    co2 DECIMAL(6, 2) CHECK (co2 BETWEEN 300 AND 5000 OR co2 IS NULL),
-    temperature DECIMAL(4, 2) CHECK (temperature BETWEEN -10 AND 50 OR temperature IS NULL),
-    humidity DECIMAL(5, 2) CHECK (humidity BETWEEN 0 AND 100 OR humidity IS NULL),
-    pressure DECIMAL(7, 2) CHECK (pressure BETWEEN 500 AND 1100 OR pressure IS NULL),
-    battery DECIMAL(5, 2) CHECK (battery BETWEEN 0 AND 100 OR battery IS NULL),
+    co2 DOUBLE PRECISION CHECK (co2 BETWEEN 300 AND 5000 OR co2 IS NULL),
+    temperature DOUBLE PRECISION CHECK (temperature BETWEEN -10 AND 50 OR temperature IS NULL),
+    humidity DOUBLE PRECISION CHECK (humidity BETWEEN 0 AND 100 OR humidity IS NULL),
+    pressure DOUBLE PRECISION CHECK (pressure BETWEEN 500 AND 1100 OR pressure IS NULL),
+    battery DOUBLE PRECISION CHECK (battery BETWEEN 0 AND 100 OR battery IS NULL),
     
     -- Calidad de señal
-    rssi DECIMAL(5, 2),
+    rssi DOUBLE PRECISION,
     data_quality VARCHAR(20) DEFAULT 'good',
     
     -- Categorías calculadas
@@ -108,8 +108,8 @@ CREATE TABLE IF NOT EXISTS alerts (
     sensor_type VARCHAR(50) NOT NULL,
     alert_type VARCHAR(50) NOT NULL,
     message TEXT NOT NULL,
-    value DECIMAL(10, 2),
-    threshold DECIMAL(10, 2),
+    value DOUBLE PRECISION,
+    threshold DOUBLE PRECISION,
     severity VARCHAR(20) CHECK (severity IN ('low', 'medium', 'high')),
     
     -- ✅ NUEVO: Referencias específicas a cada tipo de medición
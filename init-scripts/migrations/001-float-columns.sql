@@ -0,0 +1,28 @@
+-- init-scripts/migrations/001-float-columns.sql
+-- Migrar bases de datos existentes: DECIMAL -> DOUBLE PRECISION
+-- (01-init.sql solo se ejecuta al crear el volumen; las bases ya creadas
+-- conservan las columnas NUMERIC y no coinciden con consumer/models.py)
+--
+-- Ejecutar una vez sobre un volumen existente:
+--   docker exec -it iot-postgres psql -U iot_user -d iot_monitoring \
+--       -f /docker-entrypoint-initdb.d/migrations/001-float-columns.sql
+--
+-- Es idempotente: sobre columnas ya DOUBLE PRECISION no cambia nada.
+
+BEGIN;
+
+ALTER TABLE air_measurements
+    ALTER COLUMN latitude TYPE DOUBLE PRECISION,
+    ALTER COLUMN longitude TYPE DOUBLE PRECISION,
+    ALTER COLUMN co2 TYPE DOUBLE PRECISION,
+    ALTER COLUMN temperature TYPE DOUBLE PRECISION,
+    ALTER COLUMN humidity TYPE DOUBLE PRECISION,
+    ALTER COLUMN pressure TYPE DOUBLE PRECISION,
+    ALTER COLUMN battery TYPE DOUBLE PRECISION,
+    ALTER COLUMN rssi TYPE DOUBLE PRECISION;
+
+ALTER TABLE alerts
+    ALTER COLUMN value TYPE DOUBLE PRECISION,
+    ALTER COLUMN threshold TYPE DOUBLE PRECISION;
+
+COMMIT;
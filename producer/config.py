@@ -27,4 +27,6 @@ class ProducerConfig:
     batch_size: int = int(os.getenv('BATCH_SIZE', 50))
     sleep_interval: float = float(os.getenv('SLEEP_INTERVAL', 2.0))
     dataset_path: str = os.getenv('DATASET_PATH', 'datasets')
-    log_level: str = os.getenv('LOG_LEVEL', 'INFO')
\ No newline at end of file
+    log_level: str = os.getenv('LOG_LEVEL', 'INFO')
+    complete_batch_pause: float = float(os.getenv('COMPLETE_BATCH_PAUSE', 0.0))  # Pausa entre lotes en modo complete (0 = sin pausa)
+    state_flush_interval: float = float(os.getenv('STATE_FLUSH_INTERVAL', 10.0))  # Segundos entre escrituras del estado (modo smart)
\ No newline at end of file
@@ -4,6 +4,8 @@ import numpy as np
 from datetime import datetime
 import json
 import logging
+import os
+import sys
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -11,9 +13,36 @@ logger = logging.getLogger(__name__)
 class DataLoader:
     """Cargador de datos para los datasets de sensores"""
     
+    # Rangos válidos por campo: (mínimo, máximo), ambos inclusivos
+    VALID_RANGES = {
+        'co2': (300, 5000),
+        'temperature': (-10, 50),
+        'humidity': (0, 100),
+        'pressure': (500, 1100),
+        'battery': (0, 100),
+        'laeq': (30, 120),
+    }
+    
+    # Columnas del CSV que usa cada loader (el resto no se parsea)
+    CSV_COLUMNS = {
+        'aire': frozenset({
+            'time', 'deviceInfo.deviceName', 'deviceInfo.tags.Location',
+            'object.co2', 'object.temperature', 'object.humidity', 'object.pressure', 'object.battery',
+        }),
+        'sonido': frozenset({
+            'time', 'deviceInfo.deviceName', 'deviceInfo.tags.Location', 'fPort',
+            'object.LAeq', 'object.LAI', 'object.LAImax', 'object.status', 'object.battery',
+        }),
+        'agua': frozenset({
+            'time', 'deviceInfo.deviceName', 'deviceInfo.tags.Location',
+            'object.distance', 'object.status', 'code', 'object.battery',
+        }),
+    }
+    
     def __init__(self, dataset_path='datasets'):
         self.dataset_path = dataset_path
         self.processed_indices = set()  # Seguimiento de datos enviados
+        self._cache = {}  # sensor_type -> (mtime del CSV, registros procesados)
 
     def get_batch_ordered(self, sensor_type, batch_size=50, start_index=0):
         """Obtener lote ORDENADO por timestamp"""
@@ -22,10 +51,7 @@ class DataLoader:
         if not all_data:
             return []
         
-        # Ordenar por timestamp
-        all_data.sort(key=lambda x: x.get('timestamp', ''))
-        
-        # Obtener lote secuencial (no aleatorio)
+        # Obtener lote secuencial (no aleatorio); los datos ya vienen ordenados por timestamp
         end_index = min(start_index + batch_size, len(all_data))
         batch = all_data[start_index:end_index]
         
@@ -38,25 +64,37 @@ class DataLoader:
         if not all_data:
             return []
         
-        # Ordenar por timestamp
-        return sorted(all_data, key=lambda x: x.get('timestamp', ''))
+        # Ya ordenados por timestamp al cargarse
+        return all_data
         
     def load_and_process_data(self, sensor_type):
-        """Cargar y procesar datos según tipo de sensor"""
+        """Cargar y procesar datos según tipo de sensor.
+        
+        Los registros se devuelven ordenados por timestamp y se cachean hasta que
+        cambie el CSV (mtime); la lista es compartida y no debe modificarse.
+        """
         filepath = f"{self.dataset_path}/{sensor_type}.csv"
         
         try:
+            mtime = os.path.getmtime(filepath)
+            cached = self._cache.get(sensor_type)
+            if cached and cached[0] == mtime:
+                return cached[1]
+            
             logger.info(f"Cargando datos de {sensor_type} desde {filepath}")
             
             if sensor_type == 'aire':
-                return self._process_air_data(filepath)
+                records = self._process_air_data(filepath)
             elif sensor_type == 'sonido':
-                return self._process_sound_data(filepath)
+                records = self._process_sound_data(filepath)
             elif sensor_type == 'agua':
-                return self._process_water_data(filepath)
+                records = self._process_water_data(filepath)
             else:
                 logger.error(f"Tipo de sensor no soportado: {sensor_type}")
                 return []
+            
+            self._cache[sensor_type] = (mtime, records)
+            return records
                 
         except FileNotFoundError:
             logger.error(f"Archivo no encontrado: {filepath}")
@@ -67,7 +105,7 @@ class DataLoader:
     
     def _process_air_data(self, filepath):
         """Procesar datos de aire"""
-        df = pd.read_csv(filepath, low_memory=False)
+        df = self._read_csv(filepath, 'aire')
         
 
         # AÑADIR: Verificar que el DataFrame no esté vacío
@@ -87,80 +125,72 @@ class DataLoader:
         essential_cols = ['object.co2', 'object.temperature', 'object.humidity']
         df = df.dropna(subset=essential_cols, how='all')
         
-        # Limpiar y transformar
-        records = []
-        for _, row in df.iterrows():
-            record = {
-                'sensor_type': 'aire',
-                'device_name': str(row.get('deviceInfo.deviceName', '')),
-                'timestamp': pd.to_datetime(row.get('time')).isoformat() if pd.notna(row.get('time')) else None,
-                'latitude': self._extract_coordinate(row.get('deviceInfo.tags.Location'), 0),
-                'longitude': self._extract_coordinate(row.get('deviceInfo.tags.Location'), 1),
-                'co2': self._validate_co2(row.get('object.co2')),
-                'temperature': self._validate_temperature(row.get('object.temperature')),
-                'humidity': self._validate_humidity(row.get('object.humidity')),
-                'pressure': self._validate_pressure(row.get('object.pressure')),
-                'battery': self._validate_battery(row.get('object.battery')),
-                'data_quality': 'good'  # Base, se ajustará en consumer
-            }
-            records.append(record)
+        # Limpiar y transformar por columnas (sin iterar fila a fila)
+        latitude, longitude = self._location_columns(df)
+        records = self._to_records(pd.DataFrame({
+            'sensor_type': 'aire',
+            'device_name': self._text_column(df, 'deviceInfo.deviceName'),
+            'timestamp': self._timestamp_column(df),
+            'latitude': latitude,
+            'longitude': longitude,
+            'co2': self._validated_column(df, 'object.co2', 'co2'),
+            'temperature': self._validated_column(df, 'object.temperature', 'temperature'),
+            'humidity': self._validated_column(df, 'object.humidity', 'humidity'),
+            'pressure': self._validated_column(df, 'object.pressure', 'pressure'),
+            'battery': self._validated_column(df, 'object.battery', 'battery'),
+            'data_quality': 'good'  # Base, se ajustará en consumer
+        }, index=df.index))
         
         logger.info(f"Procesados {len(records)} registros de aire")
         return records
     
     def _process_sound_data(self, filepath):
         """Procesar datos de sonido"""
-        df = pd.read_csv(filepath, low_memory=False)
+        df = self._read_csv(filepath, 'sonido')
         
         # Filtrar solo mensajes de datos (fPort = 85)
         df = df[df['fPort'] == 85]
         
-        records = []
-        for _, row in df.iterrows():
-            record = {
-                'sensor_type': 'sonido',
-                'device_name': str(row.get('deviceInfo.deviceName', '')),
-                'timestamp': pd.to_datetime(row.get('time')).isoformat() if pd.notna(row.get('time')) else None,
-                'latitude': self._extract_coordinate(row.get('deviceInfo.tags.Location'), 0),
-                'longitude': self._extract_coordinate(row.get('deviceInfo.tags.Location'), 1),
-                'laeq': self._validate_laeq(row.get('object.LAeq')),
-                'lai': row.get('object.LAI'),
-                'laimax': row.get('object.LAImax'),
-                'status': str(row.get('object.status', '')),
-                'battery': self._validate_battery(row.get('object.battery')),
-                'data_quality': 'good'
-            }
-            records.append(record)
+        latitude, longitude = self._location_columns(df)
+        records = self._to_records(pd.DataFrame({
+            'sensor_type': 'sonido',
+            'device_name': self._text_column(df, 'deviceInfo.deviceName'),
+            'timestamp': self._timestamp_column(df),
+            'latitude': latitude,
+            'longitude': longitude,
+            'laeq': self._validated_column(df, 'object.LAeq', 'laeq'),
+            'lai': self._numeric_column(df, 'object.LAI'),
+            'laimax': self._numeric_column(df, 'object.LAImax'),
+            'status': self._text_column(df, 'object.status'),
+            'battery': self._validated_column(df, 'object.battery', 'battery'),
+            'data_quality': 'good'
+        }, index=df.index))
         
         logger.info(f"Procesados {len(records)} registros de sonido")
         return records
     
     def _process_water_data(self, filepath):
         """Procesar datos de agua"""
-        df = pd.read_csv(filepath, low_memory=False)
-        
-        records = []
-        for _, row in df.iterrows():
-            # Calcular nivel de agua desde distancia
-            distance = row.get('object.distance')
-            water_level = None
-            if pd.notna(distance):
-                water_level = max(0, min(100, 100 - (float(distance) / 100 * 100)))
-            
-            record = {
-                'sensor_type': 'agua',
-                'device_name': str(row.get('deviceInfo.deviceName', '')),
-                'timestamp': pd.to_datetime(row.get('time')).isoformat() if pd.notna(row.get('time')) else None,
-                'latitude': self._extract_coordinate(row.get('deviceInfo.tags.Location'), 0),
-                'longitude': self._extract_coordinate(row.get('deviceInfo.tags.Location'), 1),
-                'water_level': self._validate_water_level(water_level),
-                'distance': distance,
-                'status': str(row.get('object.status', '')),
-                'code': str(row.get('code', '')),
-                'battery': self._validate_battery(row.get('object.battery')),
-                'data_quality': 'good'
-            }
-            records.append(record)
+        df = self._read_csv(filepath, 'agua')
+        
+        # Calcular nivel de agua desde distancia (acotado a 0-100)
+        distance = self._numeric_column(df, 'object.distance')
+        water_level = (100 - distance / 100 * 100).clip(0, 100)
+        
+        latitude, longitude = self._location_columns(df)
+        records = self._to_records(pd.DataFrame({
+            'sensor_type': 'agua',
+            'device_name': self._text_column(df, 'deviceInfo.deviceName'),
+            'timestamp': self._timestamp_column(df),
+            'latitude': latitude,
+            'longitude': longitude,
+            'water_level': water_level,
+            'distance': distance,
+            'status': self._text_column(df, 'object.status'),
+            'code': self._text_column(df, 'code'),
+            'battery': self._validated_column(df, 'object.battery', 'battery'),
+            'data_quality': 'good'
+        }, index=df.index))
         
         logger.info(f"Procesados {len(records)} registros de agua")
         return records
@@ -181,49 +211,75 @@ class DataLoader:
         
         return batch
     
-    # Métodos de validación
-    def _validate_co2(self, value):
-        if pd.isna(value) or value < 300 or value > 5000:
-            return None
-        return float(value)
+    def _read_csv(self, filepath, sensor_type):
+        """Leer el CSV parseando solo las columnas que usa el loader del sensor"""
+        columns = self.CSV_COLUMNS[sensor_type]
+        return pd.read_csv(filepath, usecols=lambda column: column in columns, low_memory=False)
     
-    def _validate_temperature(self, value):
-        if pd.isna(value) or value < -10 or value > 50:
-            return None
-        return float(value)
+    # Métodos de validación y conversión por columna
+    @staticmethod
+    def _numeric_column(df, column):
+        """Columna como float (NaN si falta o no es numérica)"""
+        if column not in df.columns:
+            return pd.Series(np.nan, index=df.index)
+        return pd.to_numeric(df[column], errors='coerce')
     
-    def _validate_humidity(self, value):
-        if pd.isna(value) or value < 0 or value > 100:
-            return None
-        return float(value)
+    @staticmethod
+    def _validated_column(df, column, field):
+        """Columna numérica con los valores fuera de VALID_RANGES[field] a NaN"""
+        values = DataLoader._numeric_column(df, column)
+        low, high = DataLoader.VALID_RANGES[field]
+        return values.where(values.between(low, high))
     
-    def _validate_pressure(self, value):
-        if pd.isna(value) or value < 500 or value > 1100:
-            return None
-        return float(value)
+    @staticmethod
+    def _text_column(df, column):
+        """Columna como texto internado (equivalente a str(valor) por fila)"""
+        if column not in df.columns:
+            return pd.Series('', index=df.index)
+        return df[column].astype(str).map(sys.intern)
     
-    def _validate_battery(self, value):
-        if pd.isna(value) or value < 0 or value > 100:
-            return None
-        return float(value)
+    @staticmethod
+    def _timestamp_column(df):
+        """Timestamps ISO 8601 (None si faltan)"""
+        if 'time' not in df.columns:
+            return pd.Series(None, index=df.index, dtype=object)
+        times = pd.to_datetime(df['time'], format='ISO8601')  # Con y sin fracción de segundo
+        return pd.Series(
+            [None if pd.isna(t) else t.isoformat() for t in times],
+            index=df.index, dtype=object
+        )
     
-    def _validate_laeq(self, value):
-        if pd.isna(value) or value < 30 or value > 120:
-            return None
-        return float(value)
+    def _location_columns(self, df):
+        """Latitud y longitud: cada ubicación distinta se parsea una sola vez"""
+        column = 'deviceInfo.tags.Location'
+        if column not in df.columns:
+            empty = np.full(len(df), np.nan)
+            return empty, empty
+        codes, uniques = pd.factorize(df[column])
+        # El código -1 (ubicación nula) cae en la última posición: (None, None)
+        parsed = [self._extract_location(location) for location in uniques] + [(None, None)]
+        latitudes = np.array([lat for lat, _ in parsed], dtype=float)
+        longitudes = np.array([lon for _, lon in parsed], dtype=float)
+        return latitudes[codes], longitudes[codes]
     
-    def _validate_water_level(self, value):
-        if pd.isna(value) or value < 0 or value > 100:
-            return None
-        return float(value)
+    @staticmethod
+    def _to_records(df):
+        """DataFrame -> lista de dicts con tipos nativos (NaN -> None), ordenada por timestamp"""
+        df = df.sort_values('timestamp', kind='stable')
+        return df.astype(object).where(df.notna(), None).to_dict('records')
     
-    def _extract_coordinate(self, location_str, index):
-        """Extraer coordenadas del string de ubicación"""
+    def _extract_location(self, location_str):
+        """Extraer (latitud, longitud) del string 'lat, lon'"""
+        if pd.isna(location_str):
+            return None, None
+        lat_str, sep, lon_str = str(location_str).strip('" ').partition(',')
+        if not sep:
+            return self._to_coordinate(lat_str), None
+        return self._to_coordinate(lat_str), self._to_coordinate(lon_str.partition(',')[0])
+    
+    @staticmethod
+    def _to_coordinate(value):
         try:
-            if pd.isna(location_str):
-                return None
-            cleaned = str(location_str).strip('" ')
-            parts = cleaned.split(',')
-            return float(parts[index].strip())
-        except:
-            return None
\ No newline at end of file
+            return float(value)
+        except ValueError:
+            return None
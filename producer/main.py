@@ -1,8 +1,9 @@
 # producer/main.py
 import pika
-import json
+import orjson
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from config import RabbitMQConfig, ProducerConfig
 from data_loader import DataLoader
@@ -25,6 +26,41 @@ class Producer:
         self.channel = None
         self.data_loader = DataLoader()
         
+    def _open_channel(self):
+        """Abrir una conexión con su canal transaccional y las colas declaradas"""
+        credentials = pika.PlainCredentials(
+            self.config.username,
+            self.config.password
+        )
+        
+        parameters = pika.ConnectionParameters(
+            host=self.config.host,
+            port=self.config.port,
+            credentials=credentials,
+            heartbeat=600,
+            blocked_connection_timeout=300,
+            connection_attempts=3,
+            retry_delay=3
+        )
+        
+        connection = pika.BlockingConnection(parameters)
+        channel = connection.channel()
+        
+        # Declarar colas duraderas
+        for queue_name in self.config.queue_names.values():
+            channel.queue_declare(
+                queue=queue_name,
+                durable=True,
+                arguments={
+                    'x-message-ttl': 86400000  # 24 horas en ms
+                }
+            )
+        
+        # Canal transaccional: cada lote se confirma con un único tx_commit
+        channel.tx_select()
+        
+        return connection, channel
+    
     def connect(self):
         """Conectar a RabbitMQ con reintentos"""
         max_retries = 5
@@ -34,33 +70,7 @@ class Producer:
             try:
                 logger.info(f"Conectando a RabbitMQ (intento {attempt + 1}/{max_retries})...")
                 
-                credentials = pika.PlainCredentials(
-                    self.config.username,
-                    self.config.password
-                )
-                
-                parameters = pika.ConnectionParameters(
-                    host=self.config.host,
-                    port=self.config.port,
-                    credentials=credentials,
-                    heartbeat=600,
-                    blocked_connection_timeout=300,
-                    connection_attempts=3,
-                    retry_delay=3
-                )
-                
-                self.connection = pika.BlockingConnection(parameters)
-                self.channel = self.connection.channel()
-                
-                # Declarar colas duraderas
-                for queue_name in self.config.queue_names.values():
-                    self.channel.queue_declare(
-                        queue=queue_name,
-                        durable=True,
-                        arguments={
-                            'x-message-ttl': 86400000  # 24 horas en ms
-                        }
-                    )
+                self.connection, self.channel = self._open_channel()
                 
                 logger.info("✅ Conectado a RabbitMQ exitosamente")
                 return True
@@ -76,38 +86,62 @@ class Producer:
     
     def send_message(self, sensor_type, data):
         """Enviar mensaje a la cola correspondiente"""
+        return self.send_batch(sensor_type, [data]) == 1
+    
+    def send_batch(self, sensor_type, records, channel=None):
+        """Enviar un lote de registros en una única transacción AMQP. Devuelve cuántos se enviaron:
+        len(records) si se confirmó la transacción, 0 si se revirtió (no queda nada a medias).
+        
+        channel permite publicar por un canal propio (pika no es thread-safe).
+        """
+        channel = channel or self.channel
+        queue_name = self.config.queue_names.get(sensor_type)
+        if not queue_name:
+            logger.error(f"Tipo de sensor no válido: {sensor_type}")
+            return 0
+        
+        if not records:
+            return 0
+        
+        # Un solo instante y unas mismas propiedades para todo el lote
+        now = datetime.utcnow()
+        produced_at = now.isoformat()
+        id_prefix = f"{sensor_type}_{now.timestamp()}"
+        properties = pika.BasicProperties(
+            delivery_mode=2,  # Persistente
+            content_type='application/json',
+            timestamp=int(time.time())
+        )
+        
         try:
-            queue_name = self.config.queue_names.get(sensor_type)
-            if not queue_name:
-                logger.error(f"Tipo de sensor no válido: {sensor_type}")
-                return False
-            
-            # Crear mensaje estructurado
-            message = {
-                'sensor_type': sensor_type,
-                'data': data,
-                'produced_at': datetime.utcnow().isoformat(),
-                'message_id': f"{sensor_type}_{datetime.utcnow().timestamp()}"
-            }
-            
-            # Publicar mensaje
-            self.channel.basic_publish(
-                exchange='',
-                routing_key=queue_name,
-                body=json.dumps(message, default=str),
-                properties=pika.BasicProperties(
-                    delivery_mode=2,  # Persistente
-                    content_type='application/json',
-                    timestamp=int(time.time())
+            for index, data in enumerate(records):
+                message = {
+                    'sensor_type': sensor_type,
+                    'data': data,
+                    'produced_at': produced_at,
+                    'message_id': f"{id_prefix}_{index}"
+                }
+                
+                channel.basic_publish(
+                    exchange='',
+                    routing_key=queue_name,
+                    body=orjson.dumps(message),  # Registros ya con tipos nativos (ver DataLoader)
+                    properties=properties
                 )
-            )
             
-            logger.debug(f"📤 Mensaje enviado a {queue_name}: {data.get('device_name', 'Unknown')}")
-            return True
+            # Un único round-trip confirma todo el lote
+            channel.tx_commit()
+            
+            logger.debug(f"📤 Lote de {len(records)} mensajes enviado a {queue_name}")
+            return len(records)
             
         except Exception as e:
-            logger.error(f"Error enviando mensaje: {e}")
-            return False
+            logger.error(f"Error enviando lote de {sensor_type}: {e}")
+            try:
+                channel.tx_rollback()
+            except Exception:
+                pass
+            return 0
     
     def start_producing(self, producer_config: ProducerConfig):
         """Iniciar producción de datos"""
@@ -138,11 +172,8 @@ class Producer:
                         logger.warning(f"No hay datos para {sensor_type}")
                         continue
                     
-                    # Enviar cada registro
-                    success_count = 0
-                    for record in batch:
-                        if self.send_message(sensor_type, record):
-                            success_count += 1
+                    # Enviar el lote completo en una transacción
+                    success_count = self.send_batch(sensor_type, batch)
                     
                     if success_count > 0:
                         logger.info(f"✅ Enviados {success_count}/{len(batch)} registros de {sensor_type}")
@@ -174,38 +205,15 @@ class Producer:
         logger.info("🚀 Iniciando ENVÍO COMPLETO de datos IoT...")
         
         sensor_types = ['aire', 'sonido', 'agua']
-        total_sent = 0
         
         try:
-            for sensor_type in sensor_types:
-                logger.info(f"📤 Enviando datos de {sensor_type}...")
-                
-                # Obtener TODOS los datos ordenados
-                all_data = self.data_loader.get_all_data_ordered(sensor_type)
-                
-                if not all_data:
-                    logger.warning(f"No hay datos para {sensor_type}")
-                    continue
-                
-                logger.info(f"📊 Total de registros {sensor_type}: {len(all_data)}")
-                
-                # Enviar en lotes para no sobrecargar RabbitMQ
-                batch_size = 100  # Tamaño de lote fijo para envío completo
-                for i in range(0, len(all_data), batch_size):
-                    batch = all_data[i:i + batch_size]
-                    
-                    for record in batch:
-                        if self.send_message(sensor_type, record):
-                            total_sent += 1
-                    
-                    # Log de progreso
-                    progress = min(i + batch_size, len(all_data))
-                    logger.info(f"↳ Progreso {sensor_type}: {progress}/{len(all_data)} ({progress/len(all_data)*100:.1f}%)")
-                    
-                    # Pequeña pausa entre lotes
-                    time.sleep(0.1)
-                
-                logger.info(f"✅ Datos de {sensor_type} enviados: {len(all_data)} registros")
+            # Un hilo (y una conexión propia) por tipo de sensor: los envíos se solapan
+            with ThreadPoolExecutor(max_workers=len(sensor_types)) as executor:
+                sent_counts = executor.map(
+                    lambda sensor_type: self._send_sensor_complete(sensor_type, producer_config),
+                    sensor_types
+                )
+                total_sent = sum(sent_counts)
             
             logger.info(f"🎉 ENVÍO COMPLETO: {total_sent} registros enviados en total")
             return True
@@ -213,6 +221,48 @@ class Producer:
         except Exception as e:
             logger.error(f"💥 Error en envío completo: {e}")
             return False
+    
+    def _send_sensor_complete(self, sensor_type, producer_config: ProducerConfig):
+        """Enviar todos los datos de un sensor por una conexión propia. Devuelve cuántos se enviaron"""
+        logger.info(f"📤 Enviando datos de {sensor_type}...")
+        
+        # Obtener TODOS los datos ordenados
+        all_data = self.data_loader.get_all_data_ordered(sensor_type)
+        
+        if not all_data:
+            logger.warning(f"No hay datos para {sensor_type}")
+            return 0
+        
+        logger.info(f"📊 Total de registros {sensor_type}: {len(all_data)}")
+        
+        sent = 0
+        connection, channel = self._open_channel()
+        try:
+            # Enviar en lotes para no sobrecargar RabbitMQ
+            batch_size = 100  # Tamaño de lote fijo para envío completo
+            for i in range(0, len(all_data), batch_size):
+                batch = all_data[i:i + batch_size]
+                
+                batch_sent = self.send_batch(sensor_type, batch, channel=channel)
+                sent += batch_sent
+                
+                if batch_sent < len(batch):
+                    # Lote revertido: no seguir, los registros posteriores quedarían fuera de orden
+                    logger.error(f"❌ Envío de {sensor_type} interrumpido en el registro {i}")
+                    break
+                
+                # Log de progreso
+                progress = min(i + batch_size, len(all_data))
+                logger.info(f"↳ Progreso {sensor_type}: {progress}/{len(all_data)} ({progress/len(all_data)*100:.1f}%)")
+                
+                # Pausa opcional entre lotes (para no saturar RabbitMQ en demos)
+                if producer_config.complete_batch_pause:
+                    time.sleep(producer_config.complete_batch_pause)
+        finally:
+            connection.close()
+        
+        logger.info(f"✅ Datos de {sensor_type} enviados: {sent}/{len(all_data)} registros")
+        return sent
         
 # main.py - Producer Inteligente
 class SmartProducer(Producer):
@@ -221,28 +271,25 @@ class SmartProducer(Producer):
         logger.info("🤖 Iniciando productor INTELIGENTE...")
         
         # Inicializar gestor de estado
-        state_manager = ProducerStateManager()
+        state_manager = ProducerStateManager(producer_config.state_flush_interval)
         
         sensor_types = ['aire', 'sonido', 'agua']
         
         try:
             while True:
-                iteration_sent = 0
+                all_sent = True
                 
                 for sensor_type in sensor_types:
                     # Obtener estado actual
                     state = state_manager.get_sensor_state(sensor_type)
                     start_index = state['last_index']
                     
-                    # Cargar todos los datos
+                    # Cargar todos los datos (ya ordenados por timestamp)
                     all_data = self.data_loader.load_and_process_data(sensor_type)
                     
                     if not all_data:
                         continue
                     
-                    # Ordenar por timestamp
-                    all_data.sort(key=lambda x: x.get('timestamp', ''))
-                    
                     # Determinar cuántos datos enviar en esta iteración
                     batch_size = min(producer_config.batch_size, len(all_data) - start_index)
                     
@@ -254,32 +301,30 @@ class SmartProducer(Producer):
                         batch_size = producer_config.batch_size
                         start_index = 0
                     
+                    all_sent = False
+                    
                     # Obtener lote ordenado
                     end_index = start_index + batch_size
                     batch = all_data[start_index:end_index]
                     
                     # Enviar lote
-                    sent_count = 0
-                    for record in batch:
-                        if self.send_message(sensor_type, record):
-                            sent_count += 1
+                    sent_count = self.send_batch(sensor_type, batch)
                     
-                    # Actualizar estado
+                    # Actualizar estado: avanzar todo el lote si se confirmó la transacción y
+                    # nada si se revirtió (se reenvía en la siguiente iteración)
                     state_manager.update_sensor_state(
                         sensor_type, 
-                        end_index, 
+                        start_index + sent_count, 
                         sent_count
                     )
                     
-                    iteration_sent += sent_count
-                    
                     # Log detallado
                     logger.info(
                         f"📤 {sensor_type}: Enviados {sent_count} registros "
                         f"(Total: {state['total_sent'] + sent_count}/{len(all_data)})"
                     )
                 
-                if iteration_sent == 0:
+                if all_sent:
                     logger.info("🎉 ¡TODOS los datos han sido enviados!")
                     logger.info("🔄 Reiniciando ciclo...")
                     # Opcional: resetear estado para comenzar de nuevo
@@ -292,6 +337,7 @@ class SmartProducer(Producer):
         except KeyboardInterrupt:
             logger.info("🛑 Productor detenido")
         finally:
+            state_manager.flush()
             self.close()
 
 import argparse
@@ -1,5 +1,5 @@
 # producer/state_manager.py
-import json
+import orjson
 import os
 import time  # ← NECESARIO para time.time()
 class ProducerStateManager:
@@ -7,15 +7,18 @@ class ProducerStateManager:
     
     STATE_FILE = "producer_state.json"
     
-    def __init__(self):
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval  # Segundos mínimos entre escrituras a disco (ProducerConfig)
         self.state = self._load_state()
+        self._dirty = False
+        self._last_flush = 0.0
     
     def _load_state(self):
         """Cargar estado desde archivo"""
         if os.path.exists(self.STATE_FILE):
             try:
-                with open(self.STATE_FILE, 'r') as f:
-                    return json.load(f)
+                with open(self.STATE_FILE, 'rb') as f:
+                    return orjson.loads(f.read())
             except:
                 pass
         
@@ -30,9 +33,18 @@ class ProducerStateManager:
         }
     
     def save_state(self):
-        """Guardar estado a archivo"""
-        with open(self.STATE_FILE, 'w') as f:
-            json.dump(self.state, f, indent=2)
+        """Guardar estado a archivo de forma atómica (archivo temporal + os.replace)"""
+        tmp_file = f"{self.STATE_FILE}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(self.state, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_file, self.STATE_FILE)
+        self._dirty = False
+        self._last_flush = time.monotonic()
+    
+    def flush(self):
+        """Guardar el estado solo si hay cambios pendientes"""
+        if self._dirty:
+            self.save_state()
     
     def update_sensor_state(self, sensor_type, last_index, sent_count):
         """Actualizar estado de un sensor"""
@@ -42,7 +54,11 @@ class ProducerStateManager:
         self.state['sensors'][sensor_type]['last_index'] = last_index
         self.state['sensors'][sensor_type]['total_sent'] += sent_count
         self.state['last_run'] = time.time()
-        self.save_state()
+        
+        # Escritura diferida: como mucho una vez por flush_interval (flush() al terminar)
+        self._dirty = True
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.save_state()
     
     def get_sensor_state(self, sensor_type):
         """Obtener estado de un sensor"""